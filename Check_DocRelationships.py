@@ -1,33 +1,98 @@
 import os
-import json
+import orjson
+from concurrent.futures import ThreadPoolExecutor
 
 # Update this path to point to your doctype folder
 doctype_folder = r"\\wsl.localhost\Ubuntu-22.04\home\frappe\frappe-bench\apps\tap_lms\tap_lms\tap_lms\doctype"
 
+# Parsed results are cached here and reused while the source files are unchanged
+cache_path = os.path.join(os.path.expanduser("~"), ".cache", "tap_doctype_links.json")
+
 # Dictionary to store mapping: source_doctype: { fieldname: target_doctype }
 link_mapping = {}
 
-for root, dirs, files in os.walk(doctype_folder):
-    for file in files:
-        if file.endswith(".json"):
-            file_path = os.path.join(root, file)
-            try:
-                with open(file_path, "r") as f:
-                    data = json.load(f)
-                # Verify it's a DocType definition
-                if data.get("doctype") != "DocType":
-                    continue
-                source_doctype = data.get("name")
-                fields = data.get("fields", [])
-                for field in fields:
-                    if field.get("fieldtype") == "Link":
-                        target = field.get("options")
-                        if source_doctype not in link_mapping:
-                            link_mapping[source_doctype] = {}
-                        # Note the field that creates the link and the target DocType
-                        link_mapping[source_doctype][field.get("fieldname")] = target
-            except Exception as e:
-                print(f"Error processing {file_path}: {e}")
+
+def parse_one(file_path):
+    """
+    Parse a single JSON file and return (source_doctype, [(fieldname, target), ...]).
+    Returns None for files that are not DocType definitions and False on errors.
+    """
+    try:
+        # orjson parses the raw bytes directly; much faster than json.load on many small files
+        with open(file_path, "rb") as f:
+            data = orjson.loads(f.read())
+        # Verify it's a DocType definition
+        if data.get("doctype") != "DocType":
+            return None
+        source_doctype = data.get("name")
+        links = [
+            # Note the field that creates the link and the target DocType
+            (field.get("fieldname"), field.get("options"))
+            for field in data.get("fields", [])
+            if field.get("fieldtype") == "Link"
+        ]
+        return source_doctype, links
+    except Exception as e:
+        print(f"Error processing {file_path}: {e}")
+        return False
+
+
+def iter_json(root):
+    """Yield .json file paths under root using os.scandir (cached entry types, no extra stat per file)."""
+    with os.scandir(root) as entries:
+        for entry in entries:
+            # Skip hidden folders like .git early
+            if entry.name.startswith("."):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                yield from iter_json(entry.path)
+            elif entry.name.endswith(".json"):
+                yield entry.path
+
+
+def load_cache():
+    try:
+        with open(cache_path, "rb") as f:
+            return orjson.loads(f.read())
+    except Exception:
+        return {}
+
+
+def save_cache(entries):
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(cache_path, "wb") as f:
+            f.write(orjson.dumps(entries))
+    except Exception as e:
+        print(f"Could not write cache {cache_path}: {e}")
+
+
+# Collect candidate files first; only new or modified files (by mtime) need parsing
+json_paths = list(iter_json(doctype_folder))
+mtimes = {path: os.stat(path).st_mtime_ns for path in json_paths}
+
+cached = load_cache()
+# {path: {"mtime": ns, "result": [source_doctype, [[fieldname, target], ...]] or None}}
+entries = {path: e for path, e in cached.items() if path in mtimes and e.get("mtime") == mtimes[path]}
+stale_paths = [path for path in json_paths if path not in entries]
+
+if stale_paths:
+    # Parse them in parallel (each file is independent)
+    with ThreadPoolExecutor(max_workers=(os.cpu_count() or 1) * 2) as executor:
+        for path, result in zip(stale_paths, executor.map(parse_one, stale_paths)):
+            if result is not False:
+                entries[path] = {"mtime": mtimes[path], "result": result}
+
+if stale_paths or len(entries) != len(cached):
+    save_cache(entries)
+
+for path in json_paths:
+    result = entries.get(path, {}).get("result")
+    if not result:
+        continue
+    source_doctype, links = result
+    for fieldname, target in links:
+        link_mapping.setdefault(source_doctype, {})[fieldname] = target
 
 # Print out the link mapping
 for source, links in link_mapping.items():
@@ -36,4 +101,4 @@ for source, links in link_mapping.items():
         for fieldname, target in links.items():
             print(f"  - Field '{fieldname}' links to DocType '{target}'")
     else:
-        print(f"DocType '{source}' has no Link fields.")
\ No newline at end of file
+        print(f"DocType '{source}' has no Link fields.")
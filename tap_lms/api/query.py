@@ -1,37 +1,11 @@
 # tap_lms/api/query.py
 
 import frappe
-import json
-from typing import Dict, Any, List
 
 # Main entry point for the entire answering pipeline
 from tap_lms.services.router import answer as route_query
 from tap_lms.services.ratelimit import check_rate_limit
-
-# --- Resilient Cache Helper Functions ---
-def _get_history_from_cache(user_id: str) -> List[Dict[str, str]]:
-    """Safely retrieves and decodes chat history from the cache for a given user."""
-    try:
-        cache_key = f"chat_history_{user_id}"
-        cached_data = frappe.cache().get(cache_key)
-        if isinstance(cached_data, bytes):
-            cached_data = cached_data.decode('utf-8')
-        if isinstance(cached_data, str) and cached_data:
-            return json.loads(cached_data)
-        return []
-    except Exception as e:
-        frappe.log_error(f"Failed to retrieve chat history for {user_id}: {e}")
-        return []
-
-def _save_history_to_cache(user_id: str, history: List[Dict[str, str]]):
-    """Safely serializes and saves chat history to the cache."""
-    try:
-        cache_key = f"chat_history_{user_id}"
-        history_to_save = history[-10:]
-        frappe.cache().set(cache_key, json.dumps(history_to_save))
-    except Exception as e:
-        frappe.log_error(f"Failed to save chat history for {user_id}: {e}")
-        print(f"> [Warning] Failed to save chat history for user {user_id}")
+from tap_lms.services.chat_history import get_history, append_turn
 
 # --- API Endpoint ---
 @frappe.whitelist(methods=["POST"], allow_guest=True)
@@ -73,13 +47,10 @@ def query():
         )
 
     # --- Main Conversational Logic ---
-    chat_history = _get_history_from_cache(user_id)
+    chat_history = get_history(user_id)
     out = route_query(q, history=chat_history)
     
-    chat_history.append({"role": "user", "content": q})
-    chat_history.append({"role": "assistant", "content": out.get("answer", "")})
-    
-    _save_history_to_cache(user_id, chat_history)
+    append_turn(user_id, q, out.get("answer", ""))
 
     # --- Format and Return Response ---
     if hasattr(frappe.local, "response") and isinstance(frappe.local.response.headers, dict):
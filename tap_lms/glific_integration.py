@@ -3,9 +3,20 @@ import requests
 import json
 from datetime import datetime, timedelta, timezone
 from dateutil.parser import isoparse
+from requests.adapters import HTTPAdapter
+
+# All Glific API calls share one pooled session, so bulk onboarding reuses
+# TLS connections instead of opening a new one per request.
+GLIFIC_POOL_SIZE = 10
+GLIFIC_TIMEOUT = (10, 60)  # (connect, read) seconds
+
+glific_http = requests.Session()
+glific_http.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=GLIFIC_POOL_SIZE))
+glific_http.mount("http://", HTTPAdapter(pool_connections=2, pool_maxsize=GLIFIC_POOL_SIZE))
 
 def get_glific_settings():
-    return frappe.get_single("Glific Settings")
+    # Single DocType read on every Glific call; serve it from the document cache
+    return frappe.get_cached_doc("Glific Settings")
 
 def get_glific_auth_headers():
     settings = get_glific_settings()
@@ -32,7 +43,7 @@ def get_glific_auth_headers():
             "Content-Type": "application/json",
             "Accept": "application/json"
         }
-        response = requests.post(url, json=payload, headers=headers)
+        response = glific_http.post(url, json=payload, headers=headers, timeout=GLIFIC_TIMEOUT)
         if response.status_code == 200:
             data = response.json()["data"]
             
@@ -47,6 +58,8 @@ def get_glific_auth_headers():
             }, update_modified=False)
             
             frappe.db.commit()
+            # Clear only after the commit, so no worker re-caches the pre-commit token in between
+            frappe.clear_document_cache("Glific Settings", settings.name)
             
             return {
                 "authorization": data["access_token"],
@@ -65,27 +78,28 @@ def create_contact(name, phone, school_name, model_name, language_id, batch_id):
     url = f"{settings.api_url}/api"
     headers = get_glific_auth_headers()
 
-    # Prepare the fields dictionary
+    # Prepare the fields dictionary (one timestamp shared by all fields)
+    inserted_at = datetime.now(timezone.utc).isoformat()
     fields = {
         "school": {
             "value": school_name,
             "type": "string",
-            "inserted_at": datetime.now(timezone.utc).isoformat()
+            "inserted_at": inserted_at
         },
         "model": {
             "value": model_name,
             "type": "string",
-            "inserted_at": datetime.now(timezone.utc).isoformat()
+            "inserted_at": inserted_at
         },
         "buddy_name": {
             "value": name,
             "type": "string",
-            "inserted_at": datetime.now(timezone.utc).isoformat()
+            "inserted_at": inserted_at
         },
         "batch_id": {
             "value": batch_id,
             "type": "string",
-            "inserted_at": datetime.now(timezone.utc).isoformat()
+            "inserted_at": inserted_at
         }
     }
 
@@ -107,7 +121,7 @@ def create_contact(name, phone, school_name, model_name, language_id, batch_id):
     frappe.logger().info(f"Glific API Payload: {payload}")
 
     try:
-        response = requests.post(url, json=payload, headers=headers)
+        response = glific_http.post(url, json=payload, headers=headers, timeout=GLIFIC_TIMEOUT)
         frappe.logger().info(f"Glific API response status: {response.status_code}")
         frappe.logger().info(f"Glific API response content: {response.text}")
 
@@ -159,7 +173,7 @@ def update_contact_fields(contact_id, fields_to_update):
     
     try:
         # Get current contact data
-        fetch_response = requests.post(url, json=fetch_payload, headers=headers)
+        fetch_response = glific_http.post(url, json=fetch_payload, headers=headers, timeout=GLIFIC_TIMEOUT)
         fetch_response.raise_for_status()
         fetch_data = fetch_response.json()
         
@@ -224,7 +238,7 @@ def update_contact_fields(contact_id, fields_to_update):
         frappe.logger().info(f"Glific API Headers: {headers}")
         frappe.logger().info(f"Glific API Payload: {update_payload}")
         
-        update_response = requests.post(url, json=update_payload, headers=headers)
+        update_response = glific_http.post(url, json=update_payload, headers=headers, timeout=GLIFIC_TIMEOUT)
         frappe.logger().info(f"Glific API response status: {update_response.status_code}")
         frappe.logger().info(f"Glific API response content: {update_response.text}")
         
@@ -279,7 +293,7 @@ def get_contact_by_phone(phone):
     }
 
     try:
-        response = requests.post(url, json=payload, headers=headers)
+        response = glific_http.post(url, json=payload, headers=headers, timeout=GLIFIC_TIMEOUT)
         response.raise_for_status()
         data = response.json()
         
@@ -327,7 +341,7 @@ def optin_contact(phone, name):
     }
 
     try:
-        response = requests.post(url, json=payload, headers=headers)
+        response = glific_http.post(url, json=payload, headers=headers, timeout=GLIFIC_TIMEOUT)
         response.raise_for_status()
         data = response.json()
         
@@ -366,7 +380,7 @@ def create_contact_old(name, phone):
     frappe.logger().info(f"Glific API Payload: {payload}")
 
     try:
-        response = requests.post(url, json=payload, headers=headers)
+        response = glific_http.post(url, json=payload, headers=headers, timeout=GLIFIC_TIMEOUT)
         frappe.logger().info(f"Glific API response status: {response.status_code}")
         frappe.logger().info(f"Glific API response content: {response.text}")
 
@@ -413,7 +427,7 @@ def start_contact_flow(flow_id, contact_id, default_results):
     }
 
     try:
-        response = requests.post(url, json=payload, headers=headers)
+        response = glific_http.post(url, json=payload, headers=headers, timeout=GLIFIC_TIMEOUT)
         response.raise_for_status()
         data = response.json()
         
@@ -490,7 +504,7 @@ def check_glific_group_exists(group_label):
     }
 
     try:
-        response = requests.post(url, json=payload, headers=headers)
+        response = glific_http.post(url, json=payload, headers=headers, timeout=GLIFIC_TIMEOUT)
         response.raise_for_status()
         data = response.json()
 
@@ -537,7 +551,7 @@ def create_glific_group(label, description=""):
     }
 
     try:
-        response = requests.post(url, json=payload, headers=headers)
+        response = glific_http.post(url, json=payload, headers=headers, timeout=GLIFIC_TIMEOUT)
         response.raise_for_status()
         data = response.json()
 
@@ -641,7 +655,7 @@ def add_contact_to_group(contact_id, group_id):
     }
 
     try:
-        response = requests.post(url, json=payload, headers=headers)
+        response = glific_http.post(url, json=payload, headers=headers, timeout=GLIFIC_TIMEOUT)
         response.raise_for_status()
         data = response.json()
 
@@ -777,27 +791,28 @@ def add_student_to_glific_for_onboarding(student_name, phone, school_name, batch
             }
         }
 
-        # Add fields if available
+        # Add fields if available (one timestamp shared by all fields)
+        inserted_at = datetime.now(timezone.utc).isoformat()
         fields = {}
         # Always add buddy_name
         fields["buddy_name"] = {
             "value": student_name,
             "type": "string",
-            "inserted_at": datetime.now(timezone.utc).isoformat()
+            "inserted_at": inserted_at
         }
         
         if school_name:
             fields["school"] = {
                 "value": school_name,
                 "type": "string",
-                "inserted_at": datetime.now(timezone.utc).isoformat()
+                "inserted_at": inserted_at
             }
 
         if batch_id:
             fields["batch_id"] = {
                 "value": batch_id,
                 "type": "string",
-                "inserted_at": datetime.now(timezone.utc).isoformat()
+                "inserted_at": inserted_at
             }
 
         if course_level_name:
@@ -805,21 +820,21 @@ def add_student_to_glific_for_onboarding(student_name, phone, school_name, batch
                 "value": course_level_name,
                 "type": "string",
                 "label": "course_level",
-                "inserted_at": datetime.now(timezone.utc).isoformat()
+                "inserted_at": inserted_at
             }
 
         if course_vertical_name:
             fields["course"] = {
                 "value": course_vertical_name,
                 "type": "string",
-                "inserted_at": datetime.now(timezone.utc).isoformat()
+                "inserted_at": inserted_at
             }
 
         if grade:
             fields["grade"] = {
                 "value": grade,
                 "type": "string",
-                "inserted_at": datetime.now(timezone.utc).isoformat()
+                "inserted_at": inserted_at
             }
 
         if fields:
@@ -827,10 +842,11 @@ def add_student_to_glific_for_onboarding(student_name, phone, school_name, batch
 
         # Execute request
         try:
-            response = requests.post(
+            response = glific_http.post(
                 f"{settings.api_url}/api",
                 json=contact_data,
-                headers=get_glific_auth_headers()
+                headers=get_glific_auth_headers(),
+                timeout=GLIFIC_TIMEOUT
             )
 
             if response.status_code != 200:
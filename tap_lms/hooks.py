@@ -21,9 +21,23 @@ doc_events = {
     "StudentStageProgress": {
         "after_insert": "tap_lms.tap_lms.doctype.studentonboardingprogress.studentonboardingprogress.update_student_progress",
         "on_update": "tap_lms.tap_lms.doctype.studentonboardingprogress.studentonboardingprogress.update_student_progress"
+    },
+    # Title fields and labels used to flatten records for Pinecone/RAG are cached per worker
+    "DocType": {
+        "on_update": "tap_lms.services.pinecone_store.bump_title_fields_version"
+    },
+    "Property Setter": {
+        "on_update": "tap_lms.services.pinecone_store.bump_title_fields_version",
+        "on_trash": "tap_lms.services.pinecone_store.bump_title_fields_version"
+    },
+    "Custom Field": {
+        "on_update": "tap_lms.services.pinecone_store.bump_title_fields_version",
+        "on_trash": "tap_lms.services.pinecone_store.bump_title_fields_version"
     }
 }
 
+after_migrate = ["tap_lms.services.pinecone_store.bump_title_fields_version"]
+
 # Scheduled Tasks
 scheduler_events = {
     "daily": [
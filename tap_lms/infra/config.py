@@ -82,11 +82,18 @@ class TAPConfig:
             "vector_search_k": 5,
             "max_response_tokens": 500,
             "batch_size": 100,
+            "sql_max_statement_time": 0,  # seconds; 0 disables the cap (MariaDB only)
+            "semantic_cache_threshold": 0.95,  # cosine similarity for a cache hit
+            "semantic_cache_ttl": 3600,  # seconds
+            "semantic_cache_max_entries": 500,  # per worker process
 
             # Flags
             "enable_neo4j": True,
             "enable_redis": True,
             "enable_debug": True,
+            "enable_semantic_cache": False,
+            "enable_speculative_fallback": False,  # run vector search alongside text-to-sql
+            "enable_eager_warm": False,  # build API clients when the router is first imported
         }
 
         # 3) Merge site_config values (if any)
@@ -96,7 +103,7 @@ class TAPConfig:
                 cfg[k] = site_config[k]
 
         self._config = cfg
-        print("✅ Configuration loaded successfully")
+        logger.debug("Configuration loaded")
         # self._log_neo4j_config()
 
     # def _log_neo4j_config(self):
@@ -0,0 +1,22 @@
+# tap_lms/infra/llm.py
+# Chat model clients shared by the router and answerers.
+
+from functools import lru_cache
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    # langchain_openai is slow to import; it is loaded on the first chat_model() call
+    from langchain_openai import ChatOpenAI
+
+# Clients are built once per process per (key, model, settings) and reused across
+# calls, so construction and validation aren't repeated and HTTP pools stay warm.
+@lru_cache(maxsize=16)
+def chat_model(
+    api_key: str,
+    model: str,
+    temperature: float = 0.0,
+    max_tokens: Optional[int] = None,
+) -> "ChatOpenAI":
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(model_name=model, openai_api_key=api_key, temperature=temperature, max_tokens=max_tokens)
@@ -1,7 +1,20 @@
 # tap_lms/infra/sql_catalog.py
 import json, os
+from functools import lru_cache
 SCHEMA_PATH = os.path.join(os.path.dirname(__file__), "..", "schema", "tap_lms_schema.json")
 
 def load_schema():
+    """
+    Parsed tap_lms_schema.json. The file is only re-read when it changes (by mtime),
+    so callers share one parsed copy per process and must not mutate it.
+    """
+    return _load_schema(schema_version())
+
+@lru_cache(maxsize=1)
+def _load_schema(version: str):
     with open(SCHEMA_PATH, "r") as f:
         return json.load(f)
+
+def schema_version() -> str:
+    """Changes whenever tap_lms_schema.json is regenerated; use it in cache keys."""
+    return str(os.stat(SCHEMA_PATH).st_mtime_ns)
@@ -485,7 +485,8 @@ def get_student_glific_groups(student_id=None, phone=None, glific_id=None):
             }
         
         # Get the unique backend onboarding set IDs
-        backend_set_ids = list(set([bs.parent for bs in backend_students]))
+        backend_set_ids = list({bs.parent for bs in backend_students})
+        known_set_ids = set(backend_set_ids)
         
         # Find all Glific contact groups associated with these backend sets
         contact_groups = frappe.get_all(
@@ -505,7 +506,7 @@ def get_student_glific_groups(student_id=None, phone=None, glific_id=None):
             )
             
             if phone_matches:
-                additional_set_ids = list(set([pm.parent for pm in phone_matches if pm.parent not in backend_set_ids]))
+                additional_set_ids = list({pm.parent for pm in phone_matches} - known_set_ids)
                 
                 if additional_set_ids:
                     additional_groups = frappe.get_all(
@@ -515,7 +516,7 @@ def get_student_glific_groups(student_id=None, phone=None, glific_id=None):
                     )
                     
                     # Add to the existing groups without duplicates
-                    existing_ids = [g.name for g in contact_groups]
+                    existing_ids = {g.name for g in contact_groups}
                     for group in additional_groups:
                         if group.name not in existing_ids:
                             contact_groups.append(group)
@@ -538,7 +539,7 @@ def get_student_glific_groups(student_id=None, phone=None, glific_id=None):
                 )
                 
                 if glific_backend_students:
-                    additional_set_ids = list(set([gbs.parent for gbs in glific_backend_students if gbs.parent not in backend_set_ids]))
+                    additional_set_ids = list({gbs.parent for gbs in glific_backend_students} - known_set_ids)
                     
                     if additional_set_ids:
                         additional_groups = frappe.get_all(
@@ -548,7 +549,7 @@ def get_student_glific_groups(student_id=None, phone=None, glific_id=None):
                         )
                         
                         # Add to the existing groups without duplicates
-                        existing_ids = [g.name for g in contact_groups]
+                        existing_ids = {g.name for g in contact_groups}
                         for group in additional_groups:
                             if group.name not in existing_ids:
                                 contact_groups.append(group)
@@ -14,9 +14,12 @@ OUT_PATH = os.path.join(os.path.dirname(__file__), "tap_lms_schema.json")
 # Quick filter for non-business doctypes (e.g., __dashboard, _chart)
 SYSTEM_DTYPES_PREFIXES = ("__", "_")
 
+# Runs of underscores/hyphens, compiled once for snake_to_title
+WORD_SEPARATORS_RE = re.compile(r"[_\-]+")
+
 def snake_to_title(s: str) -> str:
     """Converts a snake_case or kebab-case string to Title Case."""
-    return re.sub(r"[_\-]+", " ", s).title()
+    return WORD_SEPARATORS_RE.sub(" ", s).title()
 
 def load_doctype(path: str) -> Dict[str, Any]:
     """Loads a DocType's JSON definition file."""
@@ -64,7 +67,7 @@ def discover() -> Tuple[Dict, List[Dict], Dict, Dict]:
             table_name = f"tab{doctype}"
             allowlist[table_name] = True
 
-            # --- Collect fields/columns and identify a display field ---
+            # --- Collect fields/columns, identify a display field and build joins in one pass ---
             fields = doc.get("fields", [])
             columns = []
             display_field = None
@@ -78,28 +81,6 @@ def discover() -> Tuple[Dict, List[Dict], Dict, Dict]:
                     if fname == "name1":
                         display_field = "name1"
 
-            # Fallback logic for display field if the first heuristic didn't find one
-            if display_field is None:
-                if "name1" in columns: display_field = "name1"
-                elif "title" in columns: display_field = "title"
-                else: display_field = None # Agent can default to using the 'name' PK
-
-            # --- Create a human-readable description for the table ---
-            human_desc = f"{snake_to_title(doctype)} records. Key columns: name (Primary Key)"
-            if display_field:
-                human_desc += f", {display_field} (display name)"
-            human_desc += "."
-
-            tables[table_name] = {
-                "doctype": doctype,
-                "pk": "name",
-                "display_field": display_field,
-                "columns": sorted(set(columns + ["name"])), # 'name' is always the PK
-                "description": human_desc,
-            }
-
-            # --- Build joins from Link and Table fields ---
-            for f in fields:
                 # Case 1: 'Link' field (Many-to-One relationship)
                 # This doctype's table has a column that is a foreign key to another table's primary key.
                 if f.get("fieldtype") == "Link" and f.get("options"):
@@ -136,6 +117,26 @@ def discover() -> Tuple[Dict, List[Dict], Dict, Dict]:
                         "why": why,
                     })
 
+            # Fallback logic for display field if the first heuristic didn't find one
+            if display_field is None:
+                if "name1" in columns: display_field = "name1"
+                elif "title" in columns: display_field = "title"
+                else: display_field = None # Agent can default to using the 'name' PK
+
+            # --- Create a human-readable description for the table ---
+            human_desc = f"{snake_to_title(doctype)} records. Key columns: name (Primary Key)"
+            if display_field:
+                human_desc += f", {display_field} (display name)"
+            human_desc += "."
+
+            tables[table_name] = {
+                "doctype": doctype,
+                "pk": "name",
+                "display_field": display_field,
+                "columns": sorted(set(columns + ["name"])), # 'name' is always the PK
+                "description": human_desc,
+            }
+
             # --- Suggested aliases for convenience ---
             if display_field:
                 aliases[f"{doctype.lower()}_name"] = [table_name, display_field]
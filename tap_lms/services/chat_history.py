@@ -0,0 +1,62 @@
+# tap_lms/services/chat_history.py
+# Per-user conversation memory kept in Frappe's Redis as an append-only list.
+
+import logging
+from typing import Dict, List
+
+import frappe
+import orjson
+
+logger = logging.getLogger(__name__)
+
+# Number of messages (user + assistant) kept per user
+MAX_HISTORY_MESSAGES = 10
+
+# Past answers can be long record listings; prompts only see the start of each message
+MAX_PROMPT_MESSAGE_CHARS = 2000
+ROLE_LABELS = {"user": "User", "assistant": "Assistant"}
+
+def _key(user_id: str) -> str:
+    return f"tap_lms:chat_history:{user_id}"
+
+def get_history(user_id: str) -> List[Dict[str, str]]:
+    """Safely reads the last MAX_HISTORY_MESSAGES messages for a user."""
+    try:
+        raw = frappe.cache().lrange(_key(user_id), -MAX_HISTORY_MESSAGES, -1) or []
+        # orjson parses the raw bytes from Redis directly, with no decode step
+        return [orjson.loads(item) for item in raw]
+    except Exception as e:
+        frappe.log_error(f"Failed to retrieve chat history for {user_id}: {e}")
+        return []
+
+def format_history(history: List[Dict[str, str]], max_chars: int = MAX_PROMPT_MESSAGE_CHARS) -> str:
+    """Renders history as "Role: content" lines for an LLM prompt, clipping long messages."""
+    lines = []
+    for msg in history:
+        role, content = msg.get("role", ""), msg.get("content") or ""
+        if len(content) > max_chars:
+            content = content[:max_chars] + "..."
+        lines.append(f"{ROLE_LABELS.get(role, role.title())}: {content}")
+    return "\n".join(lines)
+
+def append_turn(user_id: str, question: str, answer: str) -> None:
+    """
+    Appends one user/assistant turn and trims the list, in a single round-trip.
+    Only the two new messages are serialized; the stored history is never rewritten.
+    """
+    try:
+        cache = frappe.cache()
+        # Pipeline commands bypass RedisWrapper's site prefixing, so apply it here
+        # to match the key that lrange() reads.
+        key = cache.make_key(_key(user_id))
+        pipe = cache.pipeline(transaction=False)
+        pipe.rpush(
+            key,
+            orjson.dumps({"role": "user", "content": question}),
+            orjson.dumps({"role": "assistant", "content": answer}),
+        )
+        pipe.ltrim(key, -MAX_HISTORY_MESSAGES, -1)
+        pipe.execute()
+    except Exception as e:
+        frappe.log_error(f"Failed to save chat history for {user_id}: {e}")
+        logger.warning("Failed to save chat history for user %s", user_id)
@@ -2,16 +2,21 @@
 
 import json
 import logging
-from typing import List, Dict, Any, Optional
+from types import MappingProxyType
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, FrozenSet, Mapping, Tuple
 from functools import lru_cache
 
 logger = logging.getLogger(__name__)
 
 import frappe
-from langchain_openai import ChatOpenAI
 
 from tap_lms.infra.config import get_config
-from tap_lms.infra.sql_catalog import load_schema  
+from tap_lms.infra.llm import chat_model
+from tap_lms.infra.sql_catalog import load_schema, schema_version
+
+if TYPE_CHECKING:
+    # langchain_openai is slow to import; it is loaded on first use in chat_model()
+    from langchain_openai import ChatOpenAI
 
 SYSTEM_PROMPT = """You are a routing assistant. 
 Given:
@@ -34,18 +39,13 @@ Rules:
 - No prose outside JSON. No backticks.
 """
 
-def _llm() -> Optional[ChatOpenAI]:
+def _llm() -> Optional["ChatOpenAI"]:
     api_key = get_config("openai_api_key")
     model = "gpt-3.5-turbo" or get_config("primary_llm_model")
     if not api_key:
         logger.error("OpenAI API key missing.")
         return None
-    return ChatOpenAI(
-        model_name=model,
-        openai_api_key=api_key,
-        temperature=0.0,
-        max_tokens=400,
-    )
+    return chat_model(api_key, model, temperature=0.0, max_tokens=400)
 
 def _schema_summary(schema: Dict[str, Any]) -> Dict[str, Any]:
     """Compact the schema to essentials to keep prompt small."""
@@ -63,30 +63,53 @@ def _schema_summary(schema: Dict[str, Any]) -> Dict[str, Any]:
         }
     return {"tables": compact_tables, "links": links}
 
-@lru_cache(maxsize=256)
+@lru_cache(maxsize=2)
+def _summary_for_version(version: str) -> Dict[str, Any]:
+    """_schema_summary of the catalog, built once per schema version."""
+    return _schema_summary(load_schema())
+
+@lru_cache(maxsize=2)
+def _schema_snippet(version: str) -> str:
+    """The summary serialized for the prompt, once per schema version (keeps the prompt prefix stable)."""
+    return json.dumps(_summary_for_version(version), ensure_ascii=False)
+
+@lru_cache(maxsize=2)
+def _canonical_names(version: str) -> Mapping[str, str]:
+    """Lowercased DocType name -> canonical DocType name, built once per schema version (read-only)."""
+    map_lower: Dict[str, str] = {}
+    for k in _summary_for_version(version)["tables"].keys():
+        # schema uses either "tabX" or clean names in your loader; handle both
+        clean = k.replace("tab", "", 1) if k.startswith("tab") else k
+        map_lower[clean.lower()] = clean
+    return MappingProxyType(map_lower)
+
 def pick_doctypes(query: str, top_n: int = 5) -> List[str]:
     """
     Use LLM + tap_lms_schema.json to pick the best DocTypes for this query.
     Falls back to a lightweight heuristic if the LLM output isn't valid JSON.
     """
+    # The schema version is part of the cache key, so a regenerated schema invalidates old picks
+    # The cached value is a shared tuple; hand each caller its own list
+    return list(_pick_doctypes(query, top_n, schema_version()))
+
+@lru_cache(maxsize=256)
+def _pick_doctypes(query: str, top_n: int, version: str) -> Tuple[str, ...]:
     query = (query or "").strip().lower()
-    schema = load_schema()
-    summary = _schema_summary(schema)
+    summary = _summary_for_version(version)
     llm = _llm()
 
-    # Build a small, cached prompt to avoid recomputing
-    # You can cache the summary string if you like:
-    schema_snippet = json.dumps(summary, ensure_ascii=False)
+    schema_snippet = _schema_snippet(version)
 
+    # Static schema first, per-call values last: the shared prefix is eligible for OpenAI prompt caching
     user_msg = (
+        f"SCHEMA SUMMARY (DocTypes with fields & links):\n{schema_snippet}\n\n"
         f"TOP_N={top_n}\n\n"
-        f"QUESTION:\n{query}\n\n"
-        f"SCHEMA SUMMARY (DocTypes with fields & links):\n{schema_snippet}"
+        f"QUESTION:\n{query}"
     )
 
     if not llm:
         logger.warning("LLM not available; using heuristic fallback.")
-        return _fallback_doctypes(query, summary, top_n)
+        return tuple(_fallback_doctypes(query, summary, top_n))
 
     try:
         resp = llm.invoke(
@@ -99,34 +122,53 @@ def pick_doctypes(query: str, top_n: int = 5) -> List[str]:
         data = json.loads(txt)
         doctypes = data.get("doctypes", [])
         # Clean up "tabX" / bare names and dedupe
-        doctypes = _normalize_doctypes(doctypes, summary)
-        return doctypes[:top_n] if doctypes else _fallback_doctypes(query, summary, top_n)
+        doctypes = _normalize_doctypes(doctypes, version)
+        return tuple(doctypes[:top_n] if doctypes else _fallback_doctypes(query, summary, top_n))
     except Exception as e:
         logger.warning("DocType selection LLM failed: %s", e)
-        return _fallback_doctypes(query, summary, top_n)
+        return tuple(_fallback_doctypes(query, summary, top_n))
 
-def _normalize_doctypes(candidates: List[str], summary: Dict[str, Any]) -> List[str]:
+def _normalize_doctypes(candidates: List[str], version: str) -> List[str]:
     """Map user/LLM-proposed names to canonical DocType names found in schema."""
-    schema_names = set()
-    map_lower: Dict[str, str] = {}
-    for k in summary["tables"].keys():
-        # schema uses either "tabX" or clean names in your loader; handle both
-        clean = k.replace("tab", "", 1) if k.startswith("tab") else k
-        schema_names.add(clean)
-        map_lower[clean.lower()] = clean
+    map_lower = _canonical_names(version)
     normalized = []
     for name in candidates:
         nl = name.lower().replace("tab", "", 1).strip()
         if nl in map_lower:
             normalized.append(map_lower[nl])
-    # dedupe preserve order
-    seen = set()
-    out = []
-    for n in normalized:
-        if n not in seen:
-            out.append(n)
-            seen.add(n)
-    return out
+    # dedupe preserve order (LLM relevance ranking)
+    return list(dict.fromkeys(normalized))
+
+# (keyword, bonus): when the keyword is in both the query and the DocType name
+FALLBACK_NAME_BONUSES = (
+    ("student", 5),
+    ("school", 5),
+    ("activity", 5),
+)
+
+@lru_cache(maxsize=2)
+def _fallback_index(version: str) -> Tuple[Tuple[Tuple[str, str, str, Tuple[FrozenSet[str], ...]], ...], FrozenSet[str]]:
+    """
+    Builds the per-table scoring data for _fallback_doctypes once per schema version:
+    (clean name, lowercased name, lowercased description, field token sets) per table,
+    plus every distinct field token in the schema. Everything returned is immutable,
+    since the cached value is shared by every caller in the process.
+    """
+    summary = _summary_for_version(version)
+    tables = []
+    all_tokens = set()
+    for tname, tinfo in summary["tables"].items():
+        clean = tname.replace("tab", "", 1)
+        field_tokens = []
+        for f in (tinfo.get("fields") or []):
+            fl = (str(f) or "").lower()
+            if fl:
+                toks = frozenset(fl.split("_"))
+                field_tokens.append(toks)
+                all_tokens.update(toks)
+        desc = (tinfo.get("description") or "").lower()
+        tables.append((clean, clean.lower(), desc, tuple(field_tokens)))
+    return tuple(tables), frozenset(all_tokens)
 
 def _fallback_doctypes(query: str, summary: Dict[str, Any], top_n: int) -> List[str]:
     """
@@ -135,23 +177,18 @@ def _fallback_doctypes(query: str, summary: Dict[str, Any], top_n: int) -> List[
     - prefer a few obviously relevant doctypes
     """
     ql = query.lower()
+    # Query-side half of each rule is evaluated once, not once per table
+    name_bonuses = [(kw, bonus) for kw, bonus in FALLBACK_NAME_BONUSES if kw in ql]
+    tables, all_tokens = _fallback_index(schema_version())
+    # Each distinct field token is checked against the query once, instead of once per field
+    present = frozenset(tok for tok in all_tokens if tok in ql)
+    query_words = tuple(dict.fromkeys(ql.split()))
     scored: List[tuple] = []
-    for tname, tinfo in summary["tables"].items():
-        clean = tname.replace("tab", "", 1)
-        score = 0
-        desc = (tinfo.get("description") or "").lower()
-        if "student" in ql and "student" in clean.lower():
-            score += 5
-        if "school" in ql and "school" in clean.lower():
-            score += 5
-        if "activity" in ql and "activity" in clean.lower():
-            score += 5
+    for clean, clean_lower, desc, field_tokens in tables:
+        score = sum(bonus for kw, bonus in name_bonuses if kw in clean_lower)
         # field keyword overlap
-        for f in (tinfo.get("fields") or []):
-            fl = (str(f) or "").lower()
-            if fl and any(tok in ql for tok in fl.split("_")):
-                score += 1
-        if desc and any(w in desc for w in ql.split()):
+        score += sum(1 for toks in field_tokens if not toks.isdisjoint(present))
+        if desc and any(w in desc for w in query_words):
             score += 1
         if score:
             scored.append((score, clean))
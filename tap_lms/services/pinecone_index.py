@@ -4,15 +4,10 @@ from __future__ import annotations
 import time
 import frappe
 from typing import Optional
-from pinecone import Pinecone, ServerlessSpec
 
 from tap_lms.infra.config import get_config
-
-def _pc() -> Pinecone:
-    api_key = get_config("pinecone_api_key")
-    if not api_key:
-        raise RuntimeError("Missing pinecone_api_key in site_config.json")
-    return Pinecone(api_key=api_key)
+# Same per-process client the upsert/search code uses, instead of a new one per call
+from tap_lms.services.pinecone_store import pinecone_client
 
 def ensure_index(
     index_name: Optional[str] = None,
@@ -25,7 +20,10 @@ def ensure_index(
     Create the Pinecone index if it does not exist.
     Dimension must match your embedding model (e.g. OpenAI text-embedding-3-small = 1536).
     """
-    pc = _pc()
+    # Imported here so importing this module doesn't load the Pinecone SDK
+    from pinecone import ServerlessSpec
+
+    pc = pinecone_client()
     name = index_name or get_config("pinecone_index") or "tap-lms-byo"
     dim = int(dimension or get_config("embedding_dimension") or 1536)
 
@@ -50,7 +48,7 @@ def delete_index(index_name: Optional[str] = None) -> dict:
     """
     Deletes the specified Pinecone index. This is irreversible.
     """
-    pc = _pc()
+    pc = pinecone_client()
     name = index_name or get_config("pinecone_index") or "tap-lms-byo"
     
     if name in pc.list_indexes().names():
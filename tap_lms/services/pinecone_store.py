@@ -3,36 +3,106 @@ from __future__ import annotations
 
 import time
 import decimal
+from array import array
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from datetime import date, datetime, time as dtime
-from typing import Dict, List, Optional, Any
+from typing import TYPE_CHECKING, Dict, List, Optional, Any, Tuple
 
 import frappe
-from pinecone import Pinecone
-from langchain_openai import OpenAIEmbeddings
+from frappe.utils.background_jobs import enqueue
 
 from tap_lms.infra.config import get_config
 from tap_lms.infra.sql_catalog import load_schema
 from tap_lms.services.doctype_selector import pick_doctypes
 
+if TYPE_CHECKING:
+    # Both SDKs are slow to import; they are loaded when the first client is built
+    from pinecone import Pinecone
+    from langchain_openai import OpenAIEmbeddings
+
+# Fields tried, in order, when a DocType has no title_field set
+FALLBACK_TITLE_FIELDS = (
+    'title', 'name1', 'video_name', 'assignment_name', 'project_name',
+    'quiz_name', 'objective_name', 'unit_name', 'comp_name', 'note_name',
+)
+
+# Background threads embedding/upserting batches during upsert_doctype
+UPSERT_WORKERS = 2
+
+# One pool per process for query-time round-trips (query embedding, namespace fan-out),
+# reused across searches instead of starting threads per call. Its tasks never submit
+# work back to it, so they can't wait on each other.
+SEARCH_WORKERS = 8
+_search_executor = ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix="tap-search")
+
+# Fields copied from the first record of a group into Pinecone metadata for filtering
+FILTERABLE_FIELDS = ("status", "difficulty_tier", "language", "assignment_type", "grade_level", "subject")
+
+# Framework bookkeeping columns that carry no meaning for answering questions.
+# parent/parenttype stay: for child-table rows they are the only link to the owning record.
+# The "_"-prefixed JSON columns (_user_tags, _comments, _assign, ...) are dropped separately.
+META_COLUMNS = frozenset({"idx", "docstatus", "parentfield"})
+
 # --------- helpers ---------
 
-def _pc() -> Pinecone:
+# Clients are built once per process (per key/config) and reused across calls,
+# so their HTTP connection pools stay warm between queries.
+
+@lru_cache(maxsize=4)
+def _pinecone_client(api_key: str) -> Pinecone:
+    from pinecone import Pinecone
+
+    return Pinecone(api_key=api_key)
+
+@lru_cache(maxsize=4)
+def _pinecone_index(api_key: str, name: str):
+    return _pinecone_client(api_key).Index(name)
+
+@lru_cache(maxsize=4)
+def _embeddings(api_key: str, model: str) -> OpenAIEmbeddings:
+    from langchain_openai import OpenAIEmbeddings
+
+    return OpenAIEmbeddings(model=model, api_key=api_key)
+
+def pinecone_client() -> Pinecone:
+    """The per-process Pinecone client for the configured API key (shared with index management)."""
     api_key = get_config("pinecone_api_key")
     if not api_key:
         raise RuntimeError("Missing pinecone_api_key in site_config.json")
-    return Pinecone(api_key=api_key)
+    return _pinecone_client(api_key)
 
 def _index():
-    pc = _pc()
+    api_key = get_config("pinecone_api_key")
+    if not api_key:
+        raise RuntimeError("Missing pinecone_api_key in site_config.json")
     name = get_config("pinecone_index") or "tap-lms-byo"
-    return pc.Index(name)
+    return _pinecone_index(api_key, name)
 
-def _emb() -> OpenAIEmbeddings:
+def _embedding_config() -> Tuple[str, str]:
     api_key = get_config("openai_api_key")
     model = get_config("embedding_model") or "text-embedding-3-small"
     if not api_key:
         raise RuntimeError("Missing openai_api_key in site_config.json")
-    return OpenAIEmbeddings(model=model, api_key=api_key)
+    return api_key, model
+
+def _emb() -> OpenAIEmbeddings:
+    return _embeddings(*_embedding_config())
+
+@lru_cache(maxsize=256)
+def _cached_query_embedding(api_key: str, model: str, text: str) -> memoryview:
+    # Packed float32 (~6 KB per 1536-dim vector instead of ~49 KB of boxed floats),
+    # behind a read-only view so callers can't mutate a shared cache entry
+    return memoryview(array("f", _embeddings(api_key, model).embed_query(text))).toreadonly()
+
+def embed_query(text: str) -> List[float]:
+    """
+    Embeds a single query string with the configured embedding model.
+    An embedding depends only on the model and text, so repeated queries (the semantic cache
+    lookup and the search that follows it, retries, fallbacks) reuse the first result.
+    """
+    return _cached_query_embedding(*_embedding_config(), text).tolist()
 
 def _to_plain(v: Any) -> Any:
     """Make values JSON-safe for text conversion."""
@@ -42,34 +112,57 @@ def _to_plain(v: Any) -> Any:
     if isinstance(v, (datetime, date, dtime)): return v.isoformat()
     return str(v)
 
+# Bumped by hooks whenever DocType meta is edited (DocType, Property Setter, Custom Field,
+# migrate), so every worker's cached title fields are rebuilt on its next request or job.
+TITLE_FIELDS_VERSION_KEY = "tap_lms:title_fields_version"
+
+def title_fields_version() -> str:
+    """Current meta version for title_fields' cache key; read from Redis once per request/job."""
+    version = getattr(frappe.local, "tap_title_fields_version", None)
+    if version is None:
+        try:
+            version = frappe.cache().get_value(TITLE_FIELDS_VERSION_KEY) or "0"
+        except Exception:
+            version = "0"
+        frappe.local.tap_title_fields_version = version
+    return version
+
+def bump_title_fields_version(doc=None, method=None) -> None:
+    """doc_events / after_migrate hook: invalidates cached title fields in all workers."""
+    version = frappe.generate_hash(length=10)
+    frappe.cache().set_value(TITLE_FIELDS_VERSION_KEY, version)
+    frappe.local.tap_title_fields_version = version
+
+@lru_cache(maxsize=256)
+def _title_fields(site: str, doctype: str, version: str) -> Tuple[Tuple[str, str], ...]:
+    meta = frappe.get_meta(doctype)
+    candidates = ([meta.title_field] if meta.title_field else []) + list(FALLBACK_TITLE_FIELDS)
+    out = []
+    for field in dict.fromkeys(candidates):
+        df = meta.get_field(field)
+        out.append((field, (df.label if df else None) or field.replace("_", " ").title()))
+    return tuple(out)
+
+def title_fields(doctype: str) -> Tuple[Tuple[str, str], ...]:
+    """
+    (fieldname, label) pairs to try, in order, as a record's title: the DocType's
+    title_field, then FALLBACK_TITLE_FIELDS. Cached per site, DocType and meta version,
+    so record formatting doesn't go through get_meta for every row.
+    """
+    return _title_fields(frappe.local.site, doctype, title_fields_version())
+
 def _record_to_text(doctype: str, row: Dict[str, Any]) -> str:
     """
     Flatten a record to a text block, giving extra weight to the doctype's most important field.
     """
     parts = []
-    meta = frappe.get_meta(doctype)
-    
     title_field = None
-    title_value = None
-
-    official_title_field = meta.title_field
-    if official_title_field and official_title_field in row and row[official_title_field]:
-        title_field = official_title_field
-        title_value = row[title_field]
-    else:
-        fallback_fields = [
-            'title', 'name1', 'video_name', 'assignment_name', 'project_name', 
-            'quiz_name', 'objective_name', 'unit_name', 'comp_name', 'note_name'
-        ]
-        for field in fallback_fields:
-            if field in row and row[field]:
-                title_field = field
-                title_value = row[field]
-                break
 
-    if title_field and title_value:
-        title_label = meta.get_field(title_field).label or title_field.replace("_", " ").title()
-        parts.append(f"{title_label}: {title_value}")
+    for field, label in title_fields(doctype):
+        if row.get(field):
+            title_field = field
+            parts.append(f"{label}: {row[field]}")
+            break
 
     parts.append(f"DocType: {doctype}")
     parts.append(f"ID: {row.get('name','')}")
@@ -90,8 +183,35 @@ def get_db_columns_for_doctype(doctype: str) -> list[str]:
         desc = frappe.db.sql(f"DESCRIBE `{table}`", as_dict=True)
         return [d["Field"] for d in desc]
 
+def get_context_columns_for_doctype(doctype: str) -> list[str]:
+    """DB columns worth showing to the LLM: get_db_columns_for_doctype minus META_COLUMNS and "_" columns."""
+    return [c for c in get_db_columns_for_doctype(doctype) if c not in META_COLUMNS and not c.startswith("_")]
+
 # --------- upsert pipeline ---------
 
+def _iter_rows(table: str, cols_sql: str, where_sql: str, params: List[Any], page_size: int = 1000):
+    """
+    Yields rows one page at a time, so at most one page is held in memory.
+    Pages are keyed on `name` (WHERE name > last) rather than OFFSET, so later
+    pages don't re-scan the rows already read.
+    """
+    last_name = None
+    while True:
+        page_where, page_params = where_sql, list(params)
+        if last_name is not None:
+            page_where += " AND `name` > %s"
+            page_params.append(last_name)
+        # Plain SQL skips get_all's permission/hook layer; the filter and projection are built by the caller
+        rows = frappe.db.sql(
+            f"SELECT {cols_sql} FROM `{table}` WHERE {page_where} ORDER BY `name` LIMIT %s",
+            (*page_params, page_size),
+            as_dict=True,
+        )
+        if not rows: return
+        yield from rows
+        if len(rows) < page_size: return
+        last_name = rows[-1]["name"]
+
 def upsert_doctype(
     doctype: str,
     since: Optional[str] = None,
@@ -118,74 +238,75 @@ def upsert_doctype(
         where_parts.append("modified >= %s")
         params.append(since)
     where_sql = " AND ".join(where_parts)
+    cols_sql = ", ".join(f"`{c}`" for c in select_cols)
 
-    page_size = 1000
-    offset = 0
     buffer_texts, buffer_ids, buffer_meta = [], [], []
+    # Each batch is embedded and upserted in the background while the next one is read and
+    # formatted; at most UPSERT_WORKERS batches are in flight at once.
+    executor = ThreadPoolExecutor(max_workers=UPSERT_WORKERS)
+    pending: deque = deque()
+
+    def embed_and_upsert(texts: List[str], ids: List[str], metas: List[Dict[str, Any]]) -> int:
+        # Runs in a worker thread: only OpenAI and Pinecone calls, no frappe
+        vectors_values = emb.embed_documents(texts)
+        vectors = [
+            {"id": ids[i], "values": vectors_values[i], "metadata": metas[i]}
+            for i in range(len(texts))
+        ]
+        idx.upsert(vectors=vectors, namespace=doctype)
+        return len(vectors)
 
     def flush():
         nonlocal total_vectors
         if not buffer_texts: return
         
-        vectors_values = emb.embed_documents(buffer_texts)
-        vectors = [
-            {"id": buffer_ids[i], "values": vectors_values[i], "metadata": buffer_meta[i]}
-            for i in range(len(buffer_texts))
-        ]
-        idx.upsert(vectors=vectors, namespace=doctype)
-        total_vectors += len(vectors)
+        pending.append(executor.submit(embed_and_upsert, list(buffer_texts), list(buffer_ids), list(buffer_meta)))
         buffer_texts.clear(); buffer_ids.clear(); buffer_meta.clear()
+        while len(pending) > UPSERT_WORKERS:
+            total_vectors += pending.popleft().result()
 
-    group: List[Dict[str, Any]] = []
-    while True:
-        rows = frappe.get_all(doctype, filters={"docstatus": ("<", 2)}, fields=select_cols, limit_page_length=page_size, limit_start=offset)
-        if not rows: break
-
-        for row in rows:
-            total_records += 1
-            group.append(row)
-            if len(group) >= group_records:
-                record_ids = [str(g.get("name")) for g in group]
-                combined_text = "\n\n--- END OF RECORD ---\n\n".join([_record_to_text(doctype, g) for g in group])
-                
-                # --- THIS IS THE KEY CHANGE ---
-                # Create a metadata payload with filterable fields
-                meta = {
-                    "doctype": doctype,
-                    "record_ids": record_ids,
-                    "text": combined_text,
-                    "count": len(group)
-                }
-                # Add specific, known filterable fields from the first record
-                first_rec = group[0]
-                filterable_fields = ["status", "difficulty_tier", "language", "assignment_type", "grade_level", "subject"]
-                for field in filterable_fields:
-                    if field in first_rec and first_rec[field]:
-                        meta[field] = first_rec[field]
-
-                buffer_texts.append(combined_text)
-                buffer_ids.append(f"{doctype}:{record_ids[0]}:+{len(record_ids)}")
-                buffer_meta.append(meta)
-                group = []
-
-                if len(buffer_texts) >= embed_batch: flush()
-        offset += page_size
-    
-    # Process final partial group
-    if group:
+    def add_group(group: List[Dict[str, Any]]):
+        """Buffers one vector for a group of records, flushing when a batch is full."""
         record_ids = [str(g.get("name")) for g in group]
         combined_text = "\n\n--- END OF RECORD ---\n\n".join([_record_to_text(doctype, g) for g in group])
-        meta = {"doctype": doctype, "record_ids": record_ids, "text": combined_text, "count": len(group)}
+
+        # Create a metadata payload with filterable fields
+        meta = {
+            "doctype": doctype,
+            "record_ids": record_ids,
+            "text": combined_text,
+            "count": len(group)
+        }
+        # Add specific, known filterable fields from the first record
         first_rec = group[0]
-        filterable_fields = ["status", "difficulty_tier", "language", "assignment_type", "grade_level", "subject"]
-        for field in filterable_fields:
+        for field in FILTERABLE_FIELDS:
             if field in first_rec and first_rec[field]:
                 meta[field] = first_rec[field]
+
         buffer_texts.append(combined_text)
         buffer_ids.append(f"{doctype}:{record_ids[0]}:+{len(record_ids)}")
         buffer_meta.append(meta)
-    
-    flush()
+
+        if len(buffer_texts) >= embed_batch: flush()
+
+    try:
+        group: List[Dict[str, Any]] = []
+        for row in _iter_rows(table, cols_sql, where_sql, params):
+            total_records += 1
+            group.append(row)
+            if len(group) >= group_records:
+                add_group(group)
+                group = []
+
+        # Process final partial group
+        if group:
+            add_group(group)
+
+        flush()
+        while pending:
+            total_vectors += pending.popleft().result()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
     return {"doctype": doctype, "records_seen": total_records, "vectors_upserted": total_vectors}
 
 def upsert_all(
@@ -196,8 +317,7 @@ def upsert_all(
 ) -> Dict[str, Any]:
     """Upsert multiple doctypes with user-friendly console logging."""
     if doctypes is None:
-        schema = load_schema()
-        doctypes = [t[3:] if t.startswith("tab") else t for t in schema.get("allowlist", [])]
+        doctypes = _allowlisted_doctypes()
 
     print(f"Starting upsert for {len(doctypes)} DocTypes...")
 
@@ -221,6 +341,37 @@ def upsert_all(
     print("\n--- Upsert process completed. ---")
     return out
 
+def _allowlisted_doctypes() -> List[str]:
+    schema = load_schema()
+    return [t[3:] if t.startswith("tab") else t for t in schema.get("allowlist", [])]
+
+def enqueue_upsert_all(
+    doctypes: Optional[List[str]] = None,
+    since: Optional[str] = None,
+    group_records: int = 20,
+    embed_batch: int = 64,
+) -> List[str]:
+    """
+    Queue one background job per DocType on the 'long' queue instead of upserting inline.
+    Jobs run in parallel across workers and failures are logged per DocType by upsert_all.
+    """
+    if doctypes is None:
+        doctypes = _allowlisted_doctypes()
+
+    for dt in doctypes:
+        enqueue(
+            upsert_all,
+            queue="long",
+            timeout=3600,
+            job_name=f"pinecone_upsert:{dt}",
+            doctypes=[dt],
+            since=since,
+            group_records=group_records,
+            embed_batch=embed_batch,
+        )
+    print(f"Queued Pinecone upsert for {len(doctypes)} DocTypes.")
+    return doctypes
+
 # --------- search ---------
 
 def search_auto_namespaces(
@@ -233,22 +384,31 @@ def search_auto_namespaces(
     Routes query to relevant DocTypes, then searches Pinecone with optional metadata filters.
     """
     idx = _index()
-    emb = _emb()
+    # Embedding the query and routing it are independent round-trips: the embedding
+    # runs on a worker while routing (which needs the frappe context) stays here
+    qvec_future = _search_executor.submit(embed_query, q)
     doctypes = pick_doctypes(q, top_n=route_top_n) or ["VideoClass"] # Fallback to a default
-    
-    qvec = emb.embed_query(q)
+    qvec = qvec_future.result()
+
     all_matches: List[Dict] = []
-    
-    for ns in doctypes:
+
+    def query_ns(ns: str):
+        # Runs in a worker thread: no frappe calls here, errors are logged by the caller
+        return idx.query(
+            namespace=ns,
+            vector=qvec,
+            top_k=k,
+            filter=filters, 
+            include_values=False,
+            include_metadata=True,
+        )
+
+    # Namespaces are independent network round-trips, so query them concurrently
+    futures = [(ns, _search_executor.submit(query_ns, ns)) for ns in doctypes]
+
+    for ns, future in futures:
         try:
-            res = idx.query(
-                namespace=ns,
-                vector=qvec,
-                top_k=k,
-                filter=filters, 
-                include_values=False,
-                include_metadata=True,
-            )
+            res = future.result()
             for m in res.get("matches", []):
                 match_dict = {
                     "id": m.id,
@@ -272,6 +432,16 @@ def cli_upsert_all(doctypes: Optional[List[str]] = None, since: Optional[str] =
     print(frappe.as_json(out))
     return out
 
+def cli_enqueue_upsert_all(doctypes: Optional[List[str]] = None, since: Optional[str] = None, group_records: int = 20):
+    """
+    Same as cli_upsert_all, but runs in background workers.
+    Example:
+      bench execute tap_lms.services.pinecone_store.cli_enqueue_upsert_all
+    """
+    out = enqueue_upsert_all(doctypes=doctypes, since=since, group_records=group_records)
+    print(frappe.as_json(out))
+    return out
+
 def cli_search_auto(q: str, k: int = 8, route_top_n: int = 4):
     out = search_auto_namespaces(q=q, k=k, route_top_n=route_top_n)
     print(frappe.as_json(out, indent=2))
@@ -1,14 +1,22 @@
 import json
+import logging
 import time
-from typing import Dict, Any, List, Optional
+from typing import TYPE_CHECKING, Dict, Any, List, Optional
 
 import frappe
-from langchain_openai import ChatOpenAI
 
 from tap_lms.infra.config import get_config
+from tap_lms.infra.llm import chat_model
 # We no longer need the filter extractor
-from tap_lms.services.pinecone_store import search_auto_namespaces, get_db_columns_for_doctype
+from tap_lms.services.pinecone_store import search_auto_namespaces, get_context_columns_for_doctype, title_fields
 from tap_lms.services.doctype_selector import pick_doctypes
+from tap_lms.services.chat_history import format_history
+
+if TYPE_CHECKING:
+    # langchain_openai is slow to import; it is loaded on first use in chat_model()
+    from langchain_openai import ChatOpenAI
+
+logger = logging.getLogger(__name__)
 
 # --- NEW: LLM-based Query Refiner for Conversational Context ---
 
@@ -21,10 +29,10 @@ REFINER_PROMPT = """Given a chat history and a follow-up question, rewrite the f
 Return ONLY the refined, standalone question.
 """
 
-def _llm(model: str = "gpt-4o-mini", temperature: float = 0.2) -> ChatOpenAI:
-    """Initializes the Language Model client."""
+def _llm(model: str = "gpt-4o-mini", temperature: float = 0.2) -> "ChatOpenAI":
+    """Returns the shared Language Model client for these settings."""
     api_key = get_config("openai_api_key")
-    return ChatOpenAI(model_name=model, openai_api_key=api_key, temperature=temperature, max_tokens=1500)
+    return chat_model(api_key, model, temperature=temperature, max_tokens=1500)
 
 def _refine_query_with_history(query: str, history: List[Dict[str, str]]) -> str:
     """Uses an LLM to create a standalone query from a follow-up question and history."""
@@ -33,7 +41,7 @@ def _refine_query_with_history(query: str, history: List[Dict[str, str]]) -> str
 
     llm = _llm(temperature=0.0)
     # Format the history for the prompt
-    formatted_history = "\n".join([f"{msg['role']}: {msg['content']}" for msg in history])
+    formatted_history = format_history(history)
     
     user_prompt = (
         f"CHAT HISTORY:\n{formatted_history}\n\n"
@@ -44,7 +52,7 @@ def _refine_query_with_history(query: str, history: List[Dict[str, str]]) -> str
     try:
         resp = llm.invoke([("system", REFINER_PROMPT), ("user", user_prompt)])
         refined_query = getattr(resp, "content", query).strip()
-        print(f"> Refined Query for Search: {refined_query}")
+        logger.debug("Refined query for search: %s", refined_query)
         return refined_query
     except Exception as e:
         frappe.log_error(f"Query refiner failed: {e}")
@@ -56,20 +64,12 @@ def _refine_query_with_history(query: str, history: List[Dict[str, str]]) -> str
 def _record_to_text(doctype: str, row: Dict[str, Any]) -> str:
     """Flattens a record to a text block, giving weight to the title field."""
     parts = []
-    meta = frappe.get_meta(doctype)
-    title_field, title_value = None, None
-    official_title_field = meta.title_field
-    if official_title_field and official_title_field in row and row[official_title_field]:
-        title_field, title_value = official_title_field, row[official_title_field]
-    else:
-        fallback_fields = ['title', 'name1', 'video_name', 'assignment_name', 'project_name', 'quiz_name', 'objective_name', 'unit_name', 'comp_name', 'note_name']
-        for field in fallback_fields:
-            if field in row and row[field]:
-                title_field, title_value = field, row[field]
-                break
-    if title_field and title_value:
-        title_label = meta.get_field(title_field).label or title_field.replace("_", " ").title()
-        parts.append(f"{title_label}: {title_value}")
+    title_field = None
+    for field, label in title_fields(doctype):
+        if row.get(field):
+            title_field = field
+            parts.append(f"{label}: {row[field]}")
+            break
     parts.append(f"DocType: {doctype}")
     parts.append(f"ID: {row.get('name','')}")
     for k, v in row.items():
@@ -79,34 +79,59 @@ def _record_to_text(doctype: str, row: Dict[str, Any]) -> str:
     return "\n".join(parts)
 
 
-def _build_context_from_hits(hits: List[Dict[str, Any]], max_chars: int = 12000) -> Dict[str, Any]:
-    """Builds context by fetching full records from Frappe DB based on Pinecone hit metadata."""
-    context_chunks: List[str] = []
-    sources: List[Dict[str, Any]] = []
-    used_chars = 0
-    
+def _fetch_records_by_doctype(hits: List[Dict[str, Any]]) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """
+    Fetches the records referenced by all hits with one query per DocType
+    (instead of one per hit), keyed as {doctype: {name: row}}.
+    """
+    ids_by_doctype: Dict[str, Dict[str, None]] = {}
     for h in hits:
         meta = h.get("metadata") or {}
         doctype = meta.get("doctype")
         record_ids = meta.get("record_ids", [])
-        
         if not doctype or not record_ids: continue
+        ids_by_doctype.setdefault(doctype, {}).update(dict.fromkeys(record_ids))
 
+    records: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    for doctype, ids in ids_by_doctype.items():
         try:
-            fields = get_db_columns_for_doctype(doctype)
-            rows = frappe.get_all(doctype, filters={"name": ("in", record_ids)}, fields=fields) or []
-            
-            for row in rows:
-                text_chunk = _record_to_text(doctype, row)
-                if used_chars + len(text_chunk) > max_chars:
-                    break
-                
-                context_chunks.append(text_chunk)
-                sources.append({"doctype": doctype, "id": row.get("name"), "score": h.get("score")})
-                used_chars += len(text_chunk)
-        
+            fields = get_context_columns_for_doctype(doctype)
+            # Rows are re-ordered by hit rank afterwards, so skip get_all's default ORDER BY
+            rows = frappe.get_all(doctype, filters={"name": ("in", list(ids))}, fields=fields, order_by=None) or []
+            # Pinecone stores record_ids as strings; autoincrement names come back as ints
+            records[doctype] = {str(row.get("name")): row for row in rows}
         except Exception as e:
             frappe.log_error(f"Failed to fetch records for context building: {e}")
+    return records
+
+
+def _build_context_from_hits(hits: List[Dict[str, Any]], max_chars: int = 12000) -> Dict[str, Any]:
+    """Builds context by fetching full records from Frappe DB based on Pinecone hit metadata."""
+    context_chunks: List[str] = []
+    sources: List[Dict[str, Any]] = []
+    used_chars = 0
+    seen = set()
+    records = _fetch_records_by_doctype(hits)
+
+    # Walk the hits in rank order so the best matches claim the character budget first
+    for h in hits:
+        meta = h.get("metadata") or {}
+        doctype = meta.get("doctype")
+        rows_by_name = records.get(doctype)
+        if not rows_by_name: continue
+
+        for record_id in meta.get("record_ids", []):
+            row = rows_by_name.get(record_id)
+            if row is None or (doctype, record_id) in seen: continue
+
+            text_chunk = _record_to_text(doctype, row)
+            if used_chars + len(text_chunk) > max_chars:
+                break
+
+            seen.add((doctype, record_id))
+            context_chunks.append(text_chunk)
+            sources.append({"doctype": doctype, "id": row.get("name"), "score": h.get("score")})
+            used_chars += len(text_chunk)
 
         if used_chars >= max_chars: break
             
@@ -28,12 +28,15 @@ def check_rate_limit(
     cache = _cache()
     now = int(time.time())
     bucket = now // window_sec
-    k = f"{_key(api_key, scope)}:{bucket}"
+    # Pipeline commands bypass RedisWrapper's site prefixing, so apply it here
+    # (as chat_history does); otherwise sites sharing a Redis share counters.
+    k = cache.make_key(f"{_key(api_key, scope)}:{bucket}")
 
-    # Increment
-    new_count = cache.incr(k)
-    if new_count == 1:
-        cache.expire(k, window_sec + 2)  # small pad
+    # Increment and (re)arm the expiry in a single round-trip
+    pipe = cache.pipeline(transaction=False)
+    pipe.incr(k)
+    pipe.expire(k, window_sec + 2)  # small pad
+    new_count, _ = pipe.execute()
 
     remaining = max(0, limit - new_count)
     reset = (bucket + 1) * window_sec
@@ -3,15 +3,28 @@
 # MODIFIED to include a user-friendly message during the fallback process.
 
 import json
-from typing import Dict, Any, List, Optional
+import logging
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, Any, List, Optional
 
 import frappe
-from langchain_openai import ChatOpenAI
 
 # --- Tool Imports ---
 from tap_lms.infra.config import get_config
+from tap_lms.infra.llm import chat_model
 from tap_lms.services.sql_answerer import answer_from_sql
 from tap_lms.services.rag_answerer import answer_from_pinecone
+from tap_lms.services.chat_history import get_history, append_turn
+from tap_lms.services.pinecone_store import embed_query
+from tap_lms.services import doctype_selector, pinecone_store, rag_answerer, semantic_cache, sql_answerer
+
+if TYPE_CHECKING:
+    # langchain_openai is slow to import; it is loaded on first use in chat_model()
+    from langchain_openai import ChatOpenAI
+
+logger = logging.getLogger(__name__)
 
 
 # --- LLM-based Tool Chooser (Unchanged) ---
@@ -31,14 +44,62 @@ Return ONLY a JSON object with this structure:
 }
 """
 
-def _llm() -> ChatOpenAI:
-    """Initializes the Language Model client."""
+def _llm() -> "ChatOpenAI":
+    """Returns the shared Language Model client."""
     api_key = get_config("openai_api_key")
     model = get_config("primary_llm_model") or "gpt-4o-mini"
-    return ChatOpenAI(model_name=model, openai_api_key=api_key, temperature=0.0)
+    return chat_model(api_key, model, temperature=0.0)
+
+# Cues from ROUTER_PROMPT, per tool. Only text_to_sql is ever chosen from cues alone:
+# it falls back to vector search on failure, while vector search has no way back to SQL,
+# so data questions phrased like "what is the status of ..." are left to the LLM router.
+# The vector_search cues are still matched so that mixed questions count as ambiguous.
+KEYWORD_SHORTCUT_TOOL = "text_to_sql"
+KEYWORD_ROUTES = {
+    "text_to_sql": (r"list", r"count", r"how many", r"number of"),
+    "vector_search": (r"summari[sz]e", r"explain", r"what is", r"tell me about", r"describe"),
+}
+
+# All cues fused into one alternation with a named group per tool, so the
+# question is scanned once and each match reports its tool via lastgroup.
+KEYWORD_RE = re.compile(
+    r"\b(?:" + "|".join(f"(?P<{tool}>{'|'.join(cues)})" for tool, cues in KEYWORD_ROUTES.items()) + r")\b",
+    re.IGNORECASE,
+)
+
+def _keyword_route(query: str) -> Optional[str]:
+    """Returns text_to_sql when only its cues appear in the query, else None (left to the LLM)."""
+    matched = set()
+    for m in KEYWORD_RE.finditer(query):
+        matched.add(m.lastgroup)
+        if len(matched) > 1:
+            return None
+    return KEYWORD_SHORTCUT_TOOL if matched == {KEYWORD_SHORTCUT_TOOL} else None
+
+# LLM routing decisions are shared by all workers through Redis, so a repeated
+# question skips the router call; the TTL bounds staleness if the prompt changes.
+ROUTE_CACHE_TTL = 600
+
+def _route_cache_key(query: str) -> str:
+    # Case and whitespace don't change the routing decision
+    return f"tap_lms:route:{' '.join(query.lower().split())}"
 
 def choose_tool(query: str) -> str:
     """Uses an LLM to decide which tool (SQL or Vector Search) is best for the query."""
+    tool_choice = _keyword_route(query)
+    if tool_choice:
+        logger.debug("Router reason: keyword match for %s", tool_choice)
+        return tool_choice
+
+    key = _route_cache_key(query)
+    try:
+        cached = frappe.cache().get_value(key)
+        if cached:
+            logger.debug("Router reason: cached choice %s", cached)
+            return cached
+    except Exception as e:
+        logger.warning("Route cache read failed: %s", e)
+
     llm = _llm()
     user_prompt = f"USER QUESTION:\n{query}\n\nWhich tool should be used to answer this?"
     try:
@@ -48,36 +109,96 @@ def choose_tool(query: str) -> str:
             content = content[7:-3].strip()
         data = json.loads(content)
         tool_choice = data.get("tool")
-        print(f"> Router Reason: {data.get('reason')}")
+        logger.debug("Router reason: %s", data.get("reason"))
         if tool_choice in ["text_to_sql", "vector_search"]:
+            try:
+                frappe.cache().set_value(key, tool_choice, expires_in_sec=ROUTE_CACHE_TTL)
+            except Exception as e:
+                logger.warning("Route cache write failed: %s", e)
             return tool_choice
     except Exception as e:
         frappe.log_error(f"Tool router failed: {e}")
-    print("> Router failed, defaulting to vector_search.")
+    logger.info("Router failed, defaulting to vector_search")
     return "vector_search"
 
 
 # --- Main Answer Function (MODIFIED) ---
 
 def answer(q: str, history: Optional[List[Dict[str, str]]] = None) -> dict:
+    chat_history = history or []
+
+    # Standalone questions may be served from, and saved to, the semantic cache
+    qvec = None
+    if not chat_history and semantic_cache.enabled():
+        try:
+            qvec = embed_query(q)
+            cached = semantic_cache.lookup(q, qvec)
+            if cached:
+                logger.debug("Semantic cache hit")
+                return cached
+        except Exception as e:
+            frappe.log_error(f"Semantic cache lookup failed: {e}")
+
+    result = _answer(q, chat_history)
+    if qvec is not None and not _is_failure(result):
+        try:
+            semantic_cache.store(q, qvec, result)
+        except Exception as e:
+            frappe.log_error(f"Semantic cache store failed: {e}")
+    return result
+
+# Shared by the speculative vector-search fallback and client warm-up
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="tap-router")
+
+def _pinecone_in_site(site: str, sites_path: str, query: str, chat_history: List[Dict[str, str]]) -> dict:
+    """Runs answer_from_pinecone on a worker thread, which needs its own Frappe context."""
+    frappe.init(site=site, sites_path=sites_path)
+    frappe.connect()
+    try:
+        return answer_from_pinecone(query, chat_history=chat_history)
+    finally:
+        frappe.destroy()
+
+def _start_vector_fallback(query: str, chat_history: List[Dict[str, str]]) -> Optional[Future]:
+    """Submits the vector-search fallback early when speculative fallback is enabled."""
+    if not get_config("enable_speculative_fallback"):
+        return None
+    return _executor.submit(
+        _pinecone_in_site, frappe.local.site, frappe.local.sites_path, query, chat_history
+    )
+
+def _vector_fallback(future: Optional[Future], query: str, chat_history: List[Dict[str, str]]) -> dict:
+    """Returns the speculative result if one was started, else runs vector search now."""
+    if future is not None:
+        try:
+            return future.result()
+        except Exception as e:
+            frappe.log_error(f"Speculative vector search failed: {e}")
+    return answer_from_pinecone(query, chat_history=chat_history)
+
+def _answer(q: str, chat_history: List[Dict[str, str]]) -> dict:
     current_query = q
     primary_tool = choose_tool(current_query)
-    print(f"> Selected Primary Tool: {primary_tool}")
+    logger.debug("Selected primary tool: %s", primary_tool)
 
     result = {}
     fallback_used = False
-    chat_history = history or []
 
     if primary_tool == "text_to_sql":
+        # The fallback only waits on the LLM and Pinecone, so it can overlap with the SQL attempt
+        vector_future = _start_vector_fallback(current_query, chat_history)
         result = answer_from_sql(current_query, chat_history=chat_history)
         if _is_failure(result):
-            print("> Text-to-SQL failed. Falling back to Vector Search...")
+            logger.info("Text-to-SQL failed, falling back to vector search")
             fallback_used = True
             # Set an interim message to be sent to the user by the client.
             interim_message = "Searching, please wait a few more seconds..."
-            result = answer_from_pinecone(current_query, chat_history=chat_history)
+            result = _vector_fallback(vector_future, current_query, chat_history)
             # Add the message to the final result dictionary.
             result['interim_message'] = interim_message
+        elif vector_future is not None:
+            # Only drops it if it hasn't started; a running search finishes and is discarded
+            vector_future.cancel()
     else:
         primary_tool = "vector_search"
         result = answer_from_pinecone(current_query, chat_history=chat_history)
@@ -87,13 +208,15 @@ def answer(q: str, history: Optional[List[Dict[str, str]]] = None) -> dict:
 
 # --- Helper functions (Unchanged) ---
 
+BAD_PHRASES = ("i don't know", "unable to", "cannot", "no answer", "failed", "error", "could not generate a valid sql")
+# One compiled alternation scans the answer once instead of once per phrase
+BAD_PHRASES_RE = re.compile("|".join(map(re.escape, BAD_PHRASES)), re.IGNORECASE)
+
 def _is_failure(res: dict) -> bool:
     """Robust failure detector."""
     if not res: return True
     if res.get("success") is False: return True
-    text = (res.get("answer") or "").strip().lower()
-    bad_phrases = ("i don't know", "unable to", "cannot", "no answer", "failed", "error", "could not generate a valid sql")
-    if any(p in text for p in bad_phrases): return True
+    if BAD_PHRASES_RE.search(res.get("answer") or ""): return True
     return False
 
 def _with_meta(res: dict, original_query: str, primary: str, fallback: bool) -> dict:
@@ -107,30 +230,36 @@ def _with_meta(res: dict, original_query: str, primary: str, fallback: bool) ->
         res["metadata"]["doctypes_used"] = res["metadata"]["routed_doctypes"]
     return res
 
-# --- Resilient Cache & CLI ---
-
-def _get_history_from_cache(user_id: str) -> List[Dict[str, str]]:
-    try:
-        cache_key = f"chat_history_{user_id}"
-        cached_data = frappe.cache().get(cache_key)
-        if isinstance(cached_data, bytes):
-            cached_data = cached_data.decode('utf-8')
-        if isinstance(cached_data, str) and cached_data:
-            return json.loads(cached_data)
-        return []
-    except Exception as e:
-        print(f"> [Warning] Failed to retrieve or parse chat history from cache: {e}")
-        return []
-
-def _save_history_to_cache(user_id: str, history: List[Dict[str, str]]):
-    try:
-        cache_key = f"chat_history_{user_id}"
-        history_to_save = history[-10:]
-        frappe.cache().set(cache_key, json.dumps(history_to_save))
-    except Exception as e:
-        print(f"\n> [Warning] Failed to save chat history to cache: {e}")
-        print("> Conversation memory will not be available for the next turn.")
-
+# --- Client warm-up ---
+
+# Every client the answer paths build lazily: LLMs per settings, embeddings and the Pinecone index
+WARM_UP_STEPS = (
+    _llm,
+    doctype_selector._llm,
+    lambda: sql_answerer._llm("gpt-4o"),
+    sql_answerer._llm,
+    rag_answerer._llm,
+    lambda: rag_answerer._llm(temperature=0.0),
+    pinecone_store._emb,
+    pinecone_store._index,
+)
+
+def warm_up() -> None:
+    """
+    Builds all cached clients concurrently, so their imports and connection setup
+    overlap instead of landing one after another on the first questions.
+    bench execute tap_lms.services.router.warm_up
+    """
+    futures = [_executor.submit(step) for step in WARM_UP_STEPS]
+    for future in futures:
+        try:
+            future.result()
+        except Exception as e:
+            # May run outside a request, so no frappe.log_error here
+            logger.warning("Client warm-up step failed: %s", e)
+
+if get_config("enable_eager_warm"):
+    threading.Thread(target=warm_up, name="tap-router-warm-up", daemon=True).start()
 
 # --- Bench CLI (HAVING RESILIENT HISTORY) ---
 def cli(q: str, user_id: str = "default_user"):
@@ -151,7 +280,7 @@ def cli(q: str, user_id: str = "default_user"):
     
     '''
     # 1. Get history safely
-    history = _get_history_from_cache(user_id)
+    history = get_history(user_id)
     
     # 2. Call the main answer function
     out = answer(q, history=history)
@@ -160,12 +289,8 @@ def cli(q: str, user_id: str = "default_user"):
         print("\n--- INTERIM MESSAGE (Simulating Bot Message) ---")
         print(out['interim_message'])    
     
-    # 3. Update the history list
-    history.append({"role": "user", "content": q})
-    history.append({"role": "assistant", "content": out.get("answer", "")})
-    
-    # 4. Save history safely
-    _save_history_to_cache(user_id, history)
+    # 3. Append this turn to the stored history (safely)
+    append_turn(user_id, q, out.get("answer", ""))
 
     # Final, user-friendly print
     json_output_with_unicode = json.dumps(out, indent=2, default=str)
@@ -0,0 +1,119 @@
+# tap_lms/services/semantic_cache.py
+# Per-process answer cache keyed by question-embedding similarity.
+# Only standalone questions (no chat history) are cached, since follow-ups depend on context.
+
+import copy
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    # Optional: SIMD kernels for the similarity scan; numpy is used when it isn't installed
+    import simsimd
+except ImportError:
+    simsimd = None
+
+from tap_lms.infra.config import get_config
+
+# Cached embeddings are stored at half precision: half the memory, and cosine
+# similarity at unit length is unaffected at the threshold's precision
+VECTOR_DTYPE = np.float16
+
+# Embeddings barely move when only a number or a quoted name changes ("grade 6" vs
+# "grade 7"), yet the database answer does; such tokens must match exactly for a hit.
+NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+QUOTED_RE = re.compile(r"\"([^\"]+)\"|(?<!\w)'([^']+)'(?!\w)|\u201c([^\u201d]+)\u201d")
+
+_lock = threading.Lock()
+# Row i of _vectors is the unit-length embedding of the question behind _entries[i]
+_vectors: Optional[np.ndarray] = None
+_entries: List[Dict[str, Any]] = []
+
+def enabled() -> bool:
+    return bool(get_config("enable_semantic_cache"))
+
+def _exact_tokens(question: str) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """Numbers and quoted phrases in the question, which a cached answer must share."""
+    numbers = tuple(sorted(NUMBER_RE.findall(question)))
+    quoted = tuple(sorted(
+        next(g for g in groups if g).strip().lower() for groups in QUOTED_RE.findall(question)
+    ))
+    return numbers, quoted
+
+def _normalize(vec: List[float]) -> np.ndarray:
+    v = np.asarray(vec, dtype=np.float32)
+    norm = np.linalg.norm(v)
+    return v / norm if norm else v
+
+def _evict_expired(now: float) -> None:
+    """Drops entries older than the TTL; entries are kept in insertion order."""
+    global _vectors
+    ttl = get_config("semantic_cache_ttl") or 3600
+    expired = 0
+    while expired < len(_entries) and now - _entries[expired]["ts"] > ttl:
+        expired += 1
+    if expired:
+        del _entries[:expired]
+        _vectors = _vectors[expired:] if _entries else None
+
+def _similarities(q: np.ndarray) -> np.ndarray:
+    """Cosine similarity of q against every cached question (caller holds _lock)."""
+    if simsimd is not None:
+        # SimSIMD has native f16 kernels; both operands must share a dtype
+        qh = q.astype(VECTOR_DTYPE)[np.newaxis, :]
+        return 1.0 - np.asarray(simsimd.cdist(qh, _vectors, metric="cosine"))[0]
+    # Rows are unit vectors, so the dot product is the cosine similarity (computed in f32)
+    return _vectors.astype(np.float32) @ q
+
+def lookup(question: str, vec: List[float]) -> Optional[Dict[str, Any]]:
+    """
+    Returns a copy of the cached answer for the most similar question, if similar
+    enough and sharing the same numbers and quoted phrases.
+    """
+    q = _normalize(vec)
+    tokens = _exact_tokens(question)
+    threshold = get_config("semantic_cache_threshold") or 0.95
+    with _lock:
+        _evict_expired(time.time())
+        if not _entries:
+            return None
+        scores = _similarities(q)
+        # Entries whose exact tokens differ can never be a hit
+        mismatched = [i for i, e in enumerate(_entries) if e["tokens"] != tokens]
+        scores[mismatched] = -np.inf
+        best = int(np.argmax(scores))
+        similarity = float(scores[best])
+        if similarity < threshold:
+            return None
+        entry = _entries[best]
+
+    result = copy.deepcopy(entry["answer"])
+    result.setdefault("metadata", {})
+    result["metadata"].update({
+        "semantic_cache_hit": True,
+        "semantic_cache_similarity": round(similarity, 4),
+        "cached_question": entry["question"],
+    })
+    return result
+
+def store(question: str, vec: List[float], answer: Dict[str, Any]) -> None:
+    """Caches an answer under its question embedding, evicting the oldest entry when full."""
+    global _vectors
+    max_entries = get_config("semantic_cache_max_entries") or 500
+    row = _normalize(vec).astype(VECTOR_DTYPE)[np.newaxis, :]
+    with _lock:
+        now = time.time()
+        _evict_expired(now)
+        if len(_entries) >= max_entries:
+            del _entries[0]
+            _vectors = _vectors[1:]
+        _entries.append({
+            "ts": now,
+            "question": question,
+            "tokens": _exact_tokens(question),
+            "answer": copy.deepcopy(answer),
+        })
+        _vectors = row if _vectors is None or not len(_vectors) else np.vstack([_vectors, row])
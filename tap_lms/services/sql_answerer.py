@@ -3,41 +3,73 @@
 
 import json
 import logging
-from typing import Dict, Any, List, Optional
+from typing import TYPE_CHECKING, Dict, Any, List, Optional
 
 import frappe
-from langchain_openai import ChatOpenAI
+import orjson
 
 from tap_lms.infra.config import get_config
-from tap_lms.infra.sql_catalog import load_schema
+from tap_lms.infra.llm import chat_model
+from tap_lms.infra.sql_catalog import load_schema, schema_version
+from tap_lms.services.chat_history import format_history
+
+if TYPE_CHECKING:
+    # langchain_openai is slow to import; it is loaded on first use in chat_model()
+    from langchain_openai import ChatOpenAI
 
 logger = logging.getLogger(__name__)
 
 # --- LLM and Schema Helpers ---
 
-def _llm(model: str = "gpt-4o-mini") -> Optional[ChatOpenAI]:
-    """Initializes the Language Model client."""
+# Field types listed in the schema summary: filterable ones with their options,
+# plus key data fields for context.
+FILTERABLE_TYPES = frozenset({"Select", "Link"})
+CONTEXT_TYPES = frozenset({"Data", "Small Text", "Text", "Currency", "Int", "Float"})
+
+# The summary is shared by all workers through Redis; Select options can change
+# without the schema file changing, so it also expires.
+SCHEMA_SUMMARY_TTL = 3600
+
+def _llm(model: str = "gpt-4o-mini") -> Optional["ChatOpenAI"]:
+    """Returns the shared Language Model client for this model."""
     api_key = get_config("openai_api_key")
     if not api_key:
         logger.error("OpenAI API key missing.")
         return None
-    return ChatOpenAI(model_name=model, openai_api_key=api_key, temperature=0.0, max_tokens=1024)
+    return chat_model(api_key, model, temperature=0.0, max_tokens=1024)
 
 def _schema_summary_for_sql() -> str:
+    """Returns the schema summary from the shared cache, building it on a miss."""
+    key = f"tap_lms:sql_schema_summary:{schema_version()}"
+    try:
+        cached = frappe.cache().get_value(key)
+        if cached:
+            return cached
+    except Exception as e:
+        logger.warning("Schema summary cache read failed: %s", e)
+
+    summary = _build_schema_summary_for_sql()
+    try:
+        frappe.cache().set_value(key, summary, expires_in_sec=SCHEMA_SUMMARY_TTL)
+    except Exception as e:
+        logger.warning("Schema summary cache write failed: %s", e)
+    return summary
+
+def _build_schema_summary_for_sql() -> str:
     """
     Creates a rich, text-based summary of the DB schema, including filterable
     fields, their specific options, and explicit join information to guide the LLM.
     """
     schema = load_schema()
     summary_parts = []
-    
-    FILTERABLE_TYPES = {"Select", "Link"}
 
     summary_parts.append("TABLES (with filterable fields and options):")
     for tname, tinfo in schema.get("tables", {}).items():
         doctype = tinfo.get("doctype") or tname.replace("tab", "", 1)
-        
+
         try:
+            # get_meta is cached by Frappe and applies Property Setters, so Select options
+            # edited through Customize Form are the ones the LLM is told to filter on
             meta = frappe.get_meta(doctype)
             field_details = []
             for field in meta.fields:
@@ -49,9 +81,9 @@ def _schema_summary_for_sql() -> str:
                     elif field.fieldtype == "Link" and field.options:
                         field_details.append(f"{field.fieldname} (Link to {field.options})")
                 # Also include key data fields for context
-                elif field.fieldtype in {"Data", "Small Text", "Text", "Currency", "Int", "Float"}:
+                elif field.fieldtype in CONTEXT_TYPES:
                     field_details.append(f"{field.fieldname} ({field.fieldtype})")
-            
+
             if field_details:
                 summary_parts.append(f"- {tname}:")
                 for detail in field_details:
@@ -100,7 +132,8 @@ def _generate_sql_query(query: str) -> Dict[str, Any]:
     if not llm: return {"sql": None, "reason": "LLM not available."}
 
     schema_summary = _schema_summary_for_sql()
-    user_prompt = (f"QUESTION:\n{query}\n\nDATABASE SCHEMA:\n{schema_summary}\n\nGenerate the SQL query.")
+    # Static schema first, question last: the shared prefix is eligible for OpenAI prompt caching
+    user_prompt = (f"DATABASE SCHEMA:\n{schema_summary}\n\nQUESTION:\n{query}\n\nGenerate the SQL query.")
     try:
         resp = llm.invoke([("system", SQL_GEN_PROMPT), ("user", user_prompt)])
         content = getattr(resp, "content", "")
@@ -112,24 +145,59 @@ def _generate_sql_query(query: str) -> Dict[str, Any]:
         
         # Basic validation
         if sql and "SELECT" in sql.upper() and "LIMIT" in sql.upper():
-            print(f"LLM Reason for SQL: {data.get('reason')}")
+            logger.debug("LLM reason for SQL: %s", data.get("reason"))
             return data
         else:
-            print(f"LLM Reason (Query Failed Validation): {data.get('reason')}")
+            logger.debug("LLM reason (query failed validation): %s", data.get("reason"))
             return {"sql": None, "reason": data.get('reason')}
     except Exception as e:
         logger.error(f"SQL generation LLM failed: {e}")
         return {"sql": None, "reason": f"LLM error: {e}"}
 
+# MariaDB ER_STATEMENT_TIMEOUT: the statement hit max_statement_time
+ER_STATEMENT_TIMEOUT = 1969
+
+def _bounded(sql_query: str) -> str:
+    """
+    Caps the runtime of LLM-generated SQL on MariaDB so a bad plan (full scan,
+    cross join) fails fast instead of holding a worker and a DB connection.
+    """
+    limit = get_config("sql_max_statement_time") or 0
+    if not limit or frappe.db.db_type != "mariadb":
+        return sql_query
+    return f"SET STATEMENT max_statement_time={float(limit)} FOR {sql_query.strip().rstrip(';')}"
+
 def _execute_sql(sql_query: str) -> List[Dict[str, Any]]:
     """Executes a given SQL query and returns the results."""
     try:
-        return frappe.db.sql(sql_query, as_dict=True)
+        return frappe.db.sql(_bounded(sql_query), as_dict=True)
     except Exception as e:
+        if e.args and e.args[0] == ER_STATEMENT_TIMEOUT:
+            # Not "no data": surface it so the caller reports a failure instead of an empty result
+            frappe.log_error(f"SQL query timed out: {sql_query}", f"Error: {e}")
+            raise TimeoutError(f"The query exceeded the {get_config('sql_max_statement_time')}s time limit.") from e
         frappe.log_error(f"SQL execution failed for query: {sql_query}", f"Error: {e}")
         # Return an empty list on failure to prevent crashes
         return []
 
+def _results_for_prompt(results: List[Dict[str, Any]], max_chars: int = 12000) -> str:
+    """
+    Serializes SQL rows for the synthesis prompt, one compact JSON object per line,
+    stopping once max_chars is reached so a large LIMIT can't blow up the prompt.
+    """
+    lines: List[str] = []
+    used_chars = 0
+    for row in results:
+        line = orjson.dumps(row, default=str).decode()
+        if lines and used_chars + len(line) > max_chars:
+            break
+        lines.append(line)
+        used_chars += len(line) + 1
+    text = "\n".join(lines)
+    if len(lines) < len(results):
+        text += f"\n(showing the first {len(lines)} of {len(results)} rows)"
+    return text
+
 def _synthesize_answer(
     query: str,
     sql_query: str,
@@ -144,13 +212,13 @@ def _synthesize_answer(
         "Based on the conversation history and the data, formulate a friendly, natural language answer to the user's final question."
     )
     
-    history_str = "\n".join([f"{turn['role'].title()}: {turn['content']}" for turn in chat_history])
+    history_str = format_history(chat_history)
     
     user_prompt_with_context = (
         f"CONVERSATION HISTORY:\n---\n{history_str}\n---\n\n"
         f"FINAL QUESTION: {query}\n\n"
         f"SQL QUERY THAT WAS RUN: {sql_query}\n\n"
-        f"DATA RESULTS:\n{json.dumps(results, indent=2, default=str)}\n\n"
+        f"DATA RESULTS:\n{_results_for_prompt(results)}\n\n"
         "Please provide a final, user-friendly answer."
     )
 
@@ -170,7 +238,7 @@ def answer_from_sql(
     Main Text-to-SQL entry point, now aware of conversation history.
     """
     chat_history = chat_history or []
-    print("> Starting Text-to-SQL process...")
+    logger.debug("Starting Text-to-SQL process")
     
     generation_result = _generate_sql_query(query)
     sql_query = generation_result.get("sql")
@@ -178,7 +246,7 @@ def answer_from_sql(
     if not sql_query:
         # Explicitly signal failure if no valid SQL was generated.
         return {"question": query, "answer": "I could not generate a valid SQL query.", "sql_query": None, "success": False}
-    print(f"\n> Generated SQL Query:\n{sql_query}")
+    logger.debug("Generated SQL query: %s", sql_query)
     
     try:
         results = _execute_sql(sql_query)
@@ -0,0 +1,96 @@
+# tap_lms/services/test_pinecone_store.py
+# Title field resolution used when flattening records; meta and cache are faked, so no site is needed.
+
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from tap_lms.services import pinecone_store
+
+
+class FakeMeta:
+    def __init__(self, title_field=None, labels=None):
+        self.title_field = title_field
+        self.labels = labels or {}
+
+    def get_field(self, fieldname):
+        if fieldname not in self.labels:
+            return None
+        return SimpleNamespace(label=self.labels[fieldname])
+
+
+def old_title(meta, row):
+    """The per-row lookup _record_to_text did before title_fields was cached."""
+    title_field, title_value = None, None
+    if meta.title_field and meta.title_field in row and row[meta.title_field]:
+        title_field, title_value = meta.title_field, row[meta.title_field]
+    else:
+        for field in pinecone_store.FALLBACK_TITLE_FIELDS:
+            if field in row and row[field]:
+                title_field, title_value = field, row[field]
+                break
+    if title_field and title_value:
+        title_label = meta.get_field(title_field).label or title_field.replace("_", " ").title()
+        return f"{title_label}: {title_value}"
+    return None
+
+
+def new_title(doctype, row):
+    for field, label in pinecone_store.title_fields(doctype):
+        if row.get(field):
+            return f"{label}: {row[field]}"
+    return None
+
+
+class TestTitleFields(unittest.TestCase):
+    def setUp(self):
+        pinecone_store._title_fields.cache_clear()
+        self.metas = {}
+        self.redis = {}
+        cache = MagicMock()
+        cache.get_value.side_effect = self.redis.get
+        cache.set_value.side_effect = self.redis.__setitem__
+        hashes = iter(f"v{i}" for i in range(1, 100))
+        for target, value in (
+            ("local", SimpleNamespace(site="test.local")),
+            ("get_meta", MagicMock(side_effect=lambda doctype: self.metas[doctype])),
+            ("cache", MagicMock(return_value=cache)),
+            ("generate_hash", MagicMock(side_effect=lambda length=10: next(hashes))),
+        ):
+            patcher = patch.object(pinecone_store.frappe, target, value, create=True)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_matches_per_row_get_meta_lookup(self):
+        self.metas["VideoClass"] = FakeMeta("video_name", {"video_name": "Video Name", "title": None})
+        rows = [
+            {"name": "V1", "video_name": "Goal Setting", "title": "ignored"},
+            {"name": "V2", "video_name": "", "title": "Fallback Title"},
+            {"name": "V3", "description": "no title fields at all"},
+        ]
+        for row in rows:
+            self.assertEqual(new_title("VideoClass", row), old_title(self.metas["VideoClass"], row))
+
+    def test_missing_title_field_falls_back_to_prettified_name(self):
+        # The old lookup raised AttributeError here: get_field() returns None
+        self.metas["Quiz"] = FakeMeta("quiz_name", {})
+        row = {"name": "Q1", "quiz_name": "Fractions"}
+        with self.assertRaises(AttributeError):
+            old_title(self.metas["Quiz"], row)
+        self.assertEqual(new_title("Quiz", row), "Quiz Name: Fractions")
+
+    def test_meta_changes_apply_after_version_bump(self):
+        self.metas["VideoClass"] = FakeMeta("video_name", {"video_name": "Video Name"})
+        row = {"name": "V1", "video_name": "Goal Setting"}
+        self.assertEqual(new_title("VideoClass", row), "Video Name: Goal Setting")
+
+        # e.g. the label edited through Customize Form
+        self.metas["VideoClass"] = FakeMeta("video_name", {"video_name": "Lesson"})
+        self.assertEqual(new_title("VideoClass", row), "Video Name: Goal Setting")
+
+        pinecone_store.bump_title_fields_version()
+        self.assertEqual(new_title("VideoClass", row), "Lesson: Goal Setting")
+
+        # Other workers pick the new version up from Redis on their next request
+        pinecone_store.frappe.local = SimpleNamespace(site="test.local")
+        self.assertEqual(pinecone_store.title_fields_version(), "v1")
@@ -0,0 +1,79 @@
+# tap_lms/services/test_ratelimit.py
+# Fixed-window counting against an in-memory stand-in for Frappe's Redis cache.
+
+import unittest
+from unittest.mock import patch
+
+from tap_lms.services import ratelimit
+
+
+class FakePipeline:
+    def __init__(self, cache):
+        self.cache, self.ops = cache, []
+
+    def incr(self, key):
+        self.ops.append(("incr", key))
+
+    def expire(self, key, seconds):
+        self.ops.append(("expire", key, seconds))
+
+    def execute(self):
+        out = []
+        for op, key, *args in self.ops:
+            if op == "incr":
+                self.cache.counts[key] = self.cache.counts.get(key, 0) + 1
+                out.append(self.cache.counts[key])
+            else:
+                self.cache.ttls[key] = args[0]
+                out.append(True)
+        return out
+
+
+class FakeCache:
+    def __init__(self, site):
+        self.site, self.counts, self.ttls = site, {}, {}
+
+    def make_key(self, key):
+        return f"{self.site}|{key}"
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class TestCheckRateLimit(unittest.TestCase):
+    def setUp(self):
+        self.cache = FakeCache("site1.local")
+        self.now = 1_000_020  # 20s into a 60s window
+        cache_patch = patch.object(ratelimit.frappe, "cache", lambda: self.cache, create=True)
+        time_patch = patch.object(ratelimit.time, "time", lambda: self.now)
+        for patcher in (cache_patch, time_patch):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def check(self, limit=2):
+        return ratelimit.check_rate_limit("key1", "query", limit=limit, window_sec=60)
+
+    def test_counts_within_window_and_blocks_over_limit(self):
+        self.assertEqual(self.check(), (True, 1, 1_000_020 // 60 * 60 + 60))
+        self.assertEqual(self.check()[:2], (True, 0))
+        self.assertEqual(self.check()[:2], (False, 0))
+
+    def test_new_window_starts_a_new_count(self):
+        self.check()
+        self.check()
+        self.now += 60
+        self.assertEqual(self.check()[:2], (True, 1))
+
+    def test_key_is_site_prefixed_and_expires_after_window(self):
+        self.check()
+        bucket = self.now // 60
+        key = f"site1.local|tap_lms:ratelimit:query:key1:{bucket}"
+        self.assertEqual(self.cache.counts, {key: 1})
+        self.assertEqual(self.cache.ttls, {key: 62})
+
+    def test_sites_sharing_redis_keep_separate_counts(self):
+        self.check(limit=1)
+        other = FakeCache("site2.local")
+        other.counts = self.cache.counts  # same Redis, different site prefix
+        self.cache = other
+        self.assertEqual(self.check(limit=1)[:2], (True, 0))
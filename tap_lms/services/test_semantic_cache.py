@@ -0,0 +1,81 @@
+# tap_lms/services/test_semantic_cache.py
+# Pure numpy logic, so these run under plain pytest as well as bench run-tests.
+
+import unittest
+from unittest.mock import patch
+
+from tap_lms.services import semantic_cache
+
+CONFIG = {
+    "semantic_cache_threshold": 0.95,
+    "semantic_cache_ttl": 3600,
+    "semantic_cache_max_entries": 3,
+}
+
+def vec(*head):
+    """A 4-dim embedding; the cache normalizes it."""
+    return list(head) + [0.0] * (4 - len(head))
+
+
+class TestSemanticCache(unittest.TestCase):
+    def setUp(self):
+        semantic_cache._entries.clear()
+        semantic_cache._vectors = None
+        config = patch.object(semantic_cache, "get_config", side_effect=lambda key, default=None: CONFIG.get(key, default))
+        config.start()
+        self.addCleanup(config.stop)
+        self.now = 1000.0
+        clock = patch.object(semantic_cache.time, "time", side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def test_hit_at_or_above_threshold(self):
+        semantic_cache.store("list all videos", vec(1.0), {"answer": "videos"})
+        hit = semantic_cache.lookup("show all videos", vec(1.0, 0.1))  # cosine ~0.995
+        self.assertIsNotNone(hit)
+        self.assertEqual(hit["answer"], "videos")
+        self.assertTrue(hit["metadata"]["semantic_cache_hit"])
+        self.assertEqual(hit["metadata"]["cached_question"], "list all videos")
+
+    def test_miss_below_threshold(self):
+        semantic_cache.store("list all videos", vec(1.0), {"answer": "videos"})
+        self.assertIsNone(semantic_cache.lookup("list all quizzes", vec(1.0, 0.5)))  # cosine ~0.894
+
+    def test_miss_when_numbers_differ(self):
+        semantic_cache.store("students in grade 6", vec(1.0), {"answer": "grade 6"})
+        self.assertIsNone(semantic_cache.lookup("students in grade 7", vec(1.0)))
+        self.assertIsNotNone(semantic_cache.lookup("students in grade 6?", vec(1.0)))
+
+    def test_miss_when_quoted_phrases_differ(self):
+        semantic_cache.store('status of "Water Cycle"', vec(1.0), {"answer": "a"})
+        self.assertIsNone(semantic_cache.lookup('status of "Solar System"', vec(1.0)))
+        self.assertIsNotNone(semantic_cache.lookup('Status of "water cycle"', vec(1.0)))
+
+    def test_entries_expire_after_ttl(self):
+        semantic_cache.store("list all videos", vec(1.0), {"answer": "videos"})
+        self.now += CONFIG["semantic_cache_ttl"] + 1
+        self.assertIsNone(semantic_cache.lookup("list all videos", vec(1.0)))
+        self.assertEqual(semantic_cache._entries, [])
+
+    def test_oldest_entry_evicted_at_max_entries(self):
+        for i, axis in enumerate(([1.0], [0.0, 1.0], [0.0, 0.0, 1.0], [0.0, 0.0, 0.0, 1.0])):
+            self.now += 1
+            semantic_cache.store(f"question {'abcd'[i]}", vec(*axis), {"answer": i})
+        self.assertEqual(len(semantic_cache._entries), CONFIG["semantic_cache_max_entries"])
+        self.assertEqual(len(semantic_cache._vectors), CONFIG["semantic_cache_max_entries"])
+        self.assertIsNone(semantic_cache.lookup("question a", vec(1.0)))
+        self.assertEqual(semantic_cache.lookup("question d", vec(0.0, 0.0, 0.0, 1.0))["answer"], 3)
+
+    def test_returned_answer_is_isolated_from_cache(self):
+        answer = {"answer": "videos", "raw_results": [{"name": "V1"}]}
+        semantic_cache.store("list all videos", vec(1.0), answer)
+        answer["raw_results"].append({"name": "stored after"})
+
+        hit = semantic_cache.lookup("list all videos", vec(1.0))
+        self.assertEqual(hit["raw_results"], [{"name": "V1"}])
+        hit["raw_results"].clear()
+        hit["metadata"]["mutated"] = True
+
+        again = semantic_cache.lookup("list all videos", vec(1.0))
+        self.assertEqual(again["raw_results"], [{"name": "V1"}])
+        self.assertNotIn("mutated", again["metadata"])
@@ -0,0 +1,47 @@
+# tap_lms/services/test_sql_answerer.py
+# The statement-time cap and its failure handling; frappe.db is replaced, so no site is needed.
+
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from tap_lms.services import sql_answerer
+
+QUERY = "SELECT name FROM `tabVideoClass` LIMIT 20;"
+
+
+class TestBounded(unittest.TestCase):
+    def bounded(self, limit, db_type="mariadb"):
+        with patch.object(sql_answerer, "get_config", return_value=limit), \
+                patch.object(sql_answerer.frappe, "db", SimpleNamespace(db_type=db_type)):
+            return sql_answerer._bounded(QUERY)
+
+    def test_off_leaves_query_unchanged(self):
+        self.assertEqual(self.bounded(0), QUERY)
+        self.assertEqual(self.bounded(None), QUERY)
+
+    def test_on_wraps_query_for_mariadb(self):
+        self.assertEqual(
+            self.bounded(5),
+            "SET STATEMENT max_statement_time=5.0 FOR SELECT name FROM `tabVideoClass` LIMIT 20",
+        )
+
+    def test_on_ignored_for_other_databases(self):
+        self.assertEqual(self.bounded(5, db_type="postgres"), QUERY)
+
+
+class TestExecuteSql(unittest.TestCase):
+    def execute(self, error):
+        db = SimpleNamespace(db_type="mariadb", sql=MagicMock(side_effect=error))
+        with patch.object(sql_answerer, "get_config", return_value=5), \
+                patch.object(sql_answerer.frappe, "db", db), \
+                patch.object(sql_answerer.frappe, "log_error"):
+            return sql_answerer._execute_sql(QUERY)
+
+    def test_statement_timeout_is_raised_not_empty(self):
+        error = Exception(sql_answerer.ER_STATEMENT_TIMEOUT, "Query execution was interrupted (max_statement_time exceeded)")
+        with self.assertRaises(TimeoutError):
+            self.execute(error)
+
+    def test_other_errors_still_return_no_rows(self):
+        self.assertEqual(self.execute(Exception(1064, "You have an error in your SQL syntax")), [])
@@ -13,6 +13,9 @@ from tap_lms.glific_integration import (
     start_contact_flow
 )
 
+# Stage progress statuses that may be moved (back) to "assigned" when a flow is triggered
+REASSIGNABLE_STATUSES = frozenset({"not_started", "incomplete"})
+
 
 
 @frappe.whitelist()
@@ -467,7 +470,10 @@ def get_students_from_onboarding(onboarding, stage_name=None, student_status=Non
                                 "stage": stage_name,
                                 "status": student_status
                             },
-                            fields=["name"]
+                            fields=["name"],
+                            limit=1,
+                            # Only existence matters; skip the default ORDER BY
+                            order_by=None
                         )
                         
                         if stage_progress:
@@ -483,7 +489,10 @@ def get_students_from_onboarding(onboarding, stage_name=None, student_status=Non
                                 "stage_type": "OnboardingStage",
                                 "stage": stage_name
                             },
-                            fields=["name"]
+                            fields=["name"],
+                            limit=1,
+                            # Only existence matters; skip the default ORDER BY
+                            order_by=None
                         )
                         
                         if stage_progress:
@@ -499,6 +508,7 @@ def get_students_from_onboarding(onboarding, stage_name=None, student_status=Non
         # Extra handling for 'not_started' status - special case as records might not exist yet
         if stage_name and student_status == "not_started":
             # For "not_started" status, we need to find students who don't have a record for this stage
+            listed = {s.name for s in student_list}
             for bs in backend_students:
                 if bs.student_id:
                     try:
@@ -512,12 +522,16 @@ def get_students_from_onboarding(onboarding, stage_name=None, student_status=Non
                                 "stage_type": "OnboardingStage",
                                 "stage": stage_name
                             },
-                            fields=["name"]
+                            fields=["name"],
+                            limit=1,
+                            # Only existence matters; skip the default ORDER BY
+                            order_by=None
                         )
                         
                         # If no stage progress record exists, this student is in "not_started" status
-                        if not stage_progress and student.name not in [s.name for s in student_list]:
+                        if not stage_progress and student.name not in listed:
                             student_list.append(student)
+                            listed.add(student.name)
                             
                     except Exception as e:
                         frappe.logger().error(f"Error checking not_started status for student {bs.student_id}: {str(e)}")
@@ -559,7 +573,7 @@ def update_student_stage_progress(student, stage):
             progress = frappe.get_doc("StudentStageProgress", existing[0].name)
             
             # Only update if not already completed or in progress
-            if progress.status in ["not_started", "incomplete"]:
+            if progress.status in REASSIGNABLE_STATUSES:
                 progress.status = "assigned"
                 progress.last_activity_timestamp = timestamp
                 if not progress.start_timestamp:
@@ -622,7 +636,7 @@ def update_student_stage_progress_batch(students, stage):
                 if existing:
                     # Update existing record only if not already completed or in progress
                     progress = frappe.get_doc("StudentStageProgress", existing[0].name)
-                    if progress.status in ["not_started", "incomplete"]:
+                    if progress.status in REASSIGNABLE_STATUSES:
                         progress.status = "assigned"
                         progress.last_activity_timestamp = timestamp
                         if not progress.start_timestamp:
@@ -2,6 +2,7 @@
 # Flask bridge between Telegram Bot and Frappe API
 
 import os
+import re
 import requests
 from flask import Flask, request, jsonify
 from dotenv import load_dotenv
@@ -38,6 +39,17 @@ if HTTPS_PROXY:
 # Telegram send message URL
 TELEGRAM_SEND_MESSAGE_URL = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
 
+# Shared HTTP session: keeps connections to Frappe and Telegram alive across messages
+# instead of paying a new TCP/TLS handshake for every request.
+http = requests.Session()
+if PROXIES:
+    http.proxies.update(PROXIES)
+
+FRAPPE_HEADERS = {
+    'Authorization': f'token {FRAPPE_API_KEY}:{FRAPPE_API_SECRET}',
+    'Content-Type': 'application/json'
+}
+
 
 @app.route('/webhook', methods=['POST'])
 def telegram_webhook():
@@ -60,16 +72,12 @@ def telegram_webhook():
         user_id = f"telegram:{chat_id}"
 
         try:
-            headers = {
-                'Authorization': f'token {FRAPPE_API_KEY}:{FRAPPE_API_SECRET}',
-                'Content-Type': 'application/json'
-            }
             payload = {
                 'q': user_query,
                 'user_id': user_id
             }
 
-            response = requests.post(FRAPPE_API_URL, json=payload, headers=headers, timeout=60, proxies=PROXIES or None)
+            response = http.post(FRAPPE_API_URL, json=payload, headers=FRAPPE_HEADERS, timeout=60)
             response.raise_for_status()
             api_result = response.json()
 
@@ -89,7 +97,10 @@ def telegram_webhook():
 
     return jsonify(success=True)
 
-import re
+# A single * or _ that isn't part of **bold** / __italic__; compiled once at import
+STRAY_MARKDOWN_RE = re.compile(r'(?<!\*)\*(?!\*)|(?<!_)_(?!_)')
+
+
 def clean_markdown(text: str) -> str:
     """
     Cleans text for Telegram Markdown while preserving proper formatting:
@@ -105,8 +116,8 @@ def clean_markdown(text: str) -> str:
 
     # Escape stray special chars not inside proper markdown syntax
     # For example: a single * or _ that isn't wrapped properly
-    text = re.sub(r'(?<!\*)\*(?!\*)', r'\*', text)  # leave **bold** untouched
-    text = re.sub(r'(?<!_)_(?!_)', r'\_', text)      # leave _italic_ untouched
+    # leave **bold** and __italic__ untouched; both escapes happen in one pass
+    text = STRAY_MARKDOWN_RE.sub(lambda m: '\\' + m.group(0), text)
 
     return text
 
@@ -126,12 +137,12 @@ def send_telegram_message(chat_id, text):
             'parse_mode': 'Markdown'
         }
         try:
-            response = requests.post(TELEGRAM_SEND_MESSAGE_URL, json=payload, timeout=30, proxies=PROXIES or None)
+            response = http.post(TELEGRAM_SEND_MESSAGE_URL, json=payload, timeout=30)
             if response.status_code == 400:
                 print("Markdown error detected, retrying with plain text")
                 payload.pop('parse_mode')
                 payload['text'] = chunk
-                retry_response = requests.post(TELEGRAM_SEND_MESSAGE_URL, json=payload, timeout=30, proxies=PROXIES or None)
+                retry_response = http.post(TELEGRAM_SEND_MESSAGE_URL, json=payload, timeout=30)
                 retry_response.raise_for_status()
             else:
                 response.raise_for_status()